@@ -0,0 +1,172 @@
+"""
+Measure cold start: how long the app takes to import and to serve its first requests.
+
+Every measurement runs in a fresh interpreter, as a serverless cold start would.
+
+* ``import`` runs ``python -X importtime -c "import main"`` ``--runs`` times and
+  reports the median import time of the app and of each module it imports
+  directly, slowest first.
+* ``first-request`` imports the app once per style, optionally runs the
+  warm-up (``--warmup``), and times the first two ``POST /process-image``
+  requests through httpx's ASGI transport. The two requests upload
+  different images and the caches are disabled, so both do the full work.
+
+Usage (from the backend directory):
+    python benchmarks/bench_startup.py --output startup.json
+    python benchmarks/bench_startup.py --mode first-request --styles hdr_effect,cartoon --warmup
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run_child(args: list, env: dict = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})}
+    )
+
+
+def parse_importtime(stderr: str) -> tuple:
+    """
+    Parse ``-X importtime`` output.
+
+    Returns:
+        tuple: Cumulative milliseconds of ``main``, and a dict of the
+        cumulative milliseconds of each module ``main`` imported directly
+    """
+    total, direct = None, {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 1:
+            direct[name.strip()] = int(cumulative) / 1000
+        elif depth == 0:
+            if name.strip() == "main":
+                total = int(cumulative) / 1000
+                break
+            # A top-level import other than main, e.g. site
+            direct = {}
+    return total, direct
+
+
+def bench_import(runs: int) -> dict:
+    """Median import time of the app and of its direct imports."""
+    totals, modules = [], {}
+    for _ in range(runs):
+        total, direct = parse_importtime(_run_child(["-X", "importtime", "-c", "import main"]).stderr)
+        totals.append(total)
+        for name, duration in direct.items():
+            modules.setdefault(name, []).append(duration)
+    medians = {name: round(statistics.median(values), 2) for name, values in modules.items()}
+    return {
+        "import_ms": round(statistics.median(totals), 2),
+        "modules_ms": dict(sorted(medians.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+async def _first_requests(style: str, warmup: bool) -> dict:
+    # Every request must do the full work
+    os.environ["ZAINVISION_CACHE_MAX_BYTES"] = "0"
+    os.environ["ZAINVISION_RENDER_CACHE_MAX_BYTES"] = "0"
+    os.environ.pop("ZAINVISION_CACHE_DIR", None)
+
+    start = time.perf_counter()
+    import main
+    result = {"import_ms": (time.perf_counter() - start) * 1000}
+    if warmup:
+        start = time.perf_counter()
+        main.warm_up()
+        result["warmup_ms"] = (time.perf_counter() - start) * 1000
+
+    import httpx
+    from benchmarks.bench_styles import synthetic_image
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for index, label in enumerate(("first_ms", "second_ms")):
+            buffer = io.BytesIO()
+            synthetic_image(512, seed=index).save(buffer, format="JPEG", quality=90)
+            start = time.perf_counter()
+            response = await client.post(
+                "/process-image", params={"style": style, "intensity": 0.5},
+                files={"file": ("bench.jpg", buffer.getvalue(), "image/jpeg")}
+            )
+            response.raise_for_status()
+            result[label] = (time.perf_counter() - start) * 1000
+    main.worker_pool.shutdown()
+    return {name: round(value, 2) for name, value in result.items()}
+
+
+def bench_first_request(styles, runs: int, warmup: bool) -> dict:
+    """Median import, warm-up and first two request latencies of a fresh process per style."""
+    results = {}
+    for style in styles:
+        samples = []
+        for _ in range(runs):
+            args = ["benchmarks/bench_startup.py", "--child", style] + (["--warmup"] if warmup else [])
+            samples.append(json.loads(_run_child(args).stdout))
+        results[style] = {
+            name: round(statistics.median(sample[name] for sample in samples), 2)
+            for name in samples[0]
+        }
+        print(f"{style:<16} " + "  ".join(f"{name} {value:>8.1f}"
+                                          for name, value in results[style].items()))
+    return results
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ZainVision cold start.")
+    parser.add_argument("--mode", choices=("all", "import", "first-request"), default="all")
+    parser.add_argument("--styles", help="Comma-separated styles for first-request (default: all)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters per measurement")
+    parser.add_argument("--warmup", action="store_true", help="Run the startup warm-up before the requests")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BACKEND_DIR)
+    if args.child:
+        print(json.dumps(asyncio.run(_first_requests(args.child, args.warmup))))
+        return 0
+
+    report = {"meta": {
+        "runs": args.runs,
+        "warmup": args.warmup,
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "machine": platform.machine(),
+    }}
+    if args.mode in ("all", "import"):
+        report["import"] = bench_import(args.runs)
+        print(f"import main {report['import']['import_ms']:.1f} ms")
+        for name, duration in list(report["import"]["modules_ms"].items())[:10]:
+            print(f"  {name:<32} {duration:>8.1f} ms")
+    if args.mode in ("all", "first-request"):
+        if args.styles:
+            styles = [style for style in args.styles.split(",") if style.strip()]
+        else:
+            from processors.image_processor import ImageProcessor
+            styles = ImageProcessor.get_available_styles()
+        report["first_request"] = bench_first_request(styles, args.runs, args.warmup)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote results to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
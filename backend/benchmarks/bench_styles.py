@@ -0,0 +1,450 @@
+"""
+Benchmark every style across image sizes and intensities.
+
+Five modes are available:
+
+* ``processor`` calls ``ImageProcessor.process_image`` directly.
+* ``api`` drives the FastAPI app in-process through httpx's ASGI transport,
+  so upload decoding and response encoding are included.
+* ``batch`` styles a stack of ``--batch-size`` frames with
+  ``ImageProcessor.process_batch`` and reports frames per second, next to
+  the same frames processed one ``process_array`` call at a time.
+* ``quality`` times the ``fast``, ``balanced`` and ``best`` tiers of the
+  styles that have them and reports the PSNR of each against ``best``.
+* ``memory`` sends one ``POST /process-image`` per case straight to the ASGI
+  app, in a fresh interpreter, and reports the peak resident memory the
+  request adds (Linux only). Unlike the tracemalloc peaks of the other
+  modes this includes PIL's and OpenCV's own buffers and the upload.
+
+The render cache is disabled so every run does the full work.
+
+Results are written as JSON and can be compared against a stored baseline;
+the run exits with status 1 if any case regresses beyond the threshold.
+
+Usage (from the backend directory):
+    python benchmarks/bench_styles.py --output bench.json
+    python benchmarks/bench_styles.py --baseline bench.json --threshold 0.25
+    python benchmarks/bench_styles.py --mode batch --batch-size 64 --sizes 256
+    python benchmarks/bench_styles.py --mode quality --sizes 512,1024
+    python benchmarks/bench_styles.py --mode memory --sizes 4000 --upload-format png
+"""
+import argparse
+import asyncio
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processors.filters import QUALITIES, get_style  # noqa: E402
+from processors.image_processor import ImageProcessor  # noqa: E402
+from processors.render_cache import RenderCache  # noqa: E402
+
+
+def synthetic_image(longest_side: int, seed: int = 0) -> Image.Image:
+    """
+    Build a reproducible 4:3 test image with gradients, edges and texture,
+    so edge-aware and smoothing styles do representative work.
+    """
+    rows, cols = (longest_side * 3) // 4, longest_side
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:rows, 0:cols]
+    image = np.empty((rows, cols, 3), dtype=np.float32)
+    image[:, :, 0] = 255 * x / max(cols - 1, 1)
+    image[:, :, 1] = 255 * y / max(rows - 1, 1)
+    image[:, :, 2] = 128 + 100 * np.sin(x / 17.0) * np.cos(y / 23.0)
+    image += rng.normal(0, 12, image.shape)
+    image = np.clip(image, 0, 255).astype(np.uint8)
+    for _ in range(12):
+        center = (int(rng.integers(0, cols)), int(rng.integers(0, rows)))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(image, center, int(rng.integers(5, max(6, rows // 4))), color, -1)
+    return Image.fromarray(image)
+
+
+def _summarize(durations: list, peak_bytes: int) -> dict:
+    durations_ms = np.array(durations) * 1000
+    return {
+        "runs": len(durations),
+        "mean_ms": round(float(durations_ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(durations_ms, 50)), 3),
+        "p99_ms": round(float(np.percentile(durations_ms, 99)), 3),
+        "throughput_per_s": round(1000 / float(durations_ms.mean()), 2),
+        "peak_mem_mb": round(peak_bytes / 1e6, 2),
+    }
+
+
+def bench_processor(styles, sizes, intensities, repeat: int, warmup: int) -> dict:
+    """Time ``ImageProcessor.process_image`` for every case."""
+    results = {}
+    for size in sizes:
+        image = synthetic_image(size)
+        for style in styles:
+            for intensity in intensities:
+                for _ in range(warmup):
+                    ImageProcessor.process_image(image, style, intensity)
+
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    ImageProcessor.process_image(image, style, intensity)
+                    durations.append(time.perf_counter() - start)
+
+                # Separate traced run: tracemalloc slows allocation-heavy code down
+                tracemalloc.start()
+                ImageProcessor.process_image(image, style, intensity)
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                key = f"{style}@{size}@{intensity}"
+                results[key] = _summarize(durations, peak)
+                _print_case(key, results[key])
+    return results
+
+
+def bench_batch(styles, sizes, intensities, repeat: int, warmup: int, batch_size: int) -> dict:
+    """Time ``ImageProcessor.process_batch`` over a stack of frames for every case."""
+    results = {}
+    for size in sizes:
+        frames = np.stack([np.asarray(synthetic_image(size, seed)) for seed in range(batch_size)])
+        out = np.empty_like(frames)
+        for style in styles:
+            for intensity in intensities:
+                def run_batch():
+                    ImageProcessor.process_batch(frames, style, intensity, "RGB", out=out)
+
+                def run_loop():
+                    for index, frame in enumerate(frames):
+                        out[index] = ImageProcessor.process_array(frame, style, intensity, "RGB")
+
+                for _ in range(warmup):
+                    run_batch()
+
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    run_batch()
+                    durations.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                run_loop()
+                loop_seconds = time.perf_counter() - start
+
+                tracemalloc.start()
+                run_batch()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                key = f"{style}@{size}@{intensity}"
+                results[key] = _summarize(durations, peak)
+                results[key]["frames_per_s"] = round(batch_size * results[key]["throughput_per_s"], 1)
+                results[key]["loop_frames_per_s"] = round(batch_size / loop_seconds, 1)
+                _print_case(key, results[key])
+    return results
+
+
+def bench_quality(styles, sizes, repeat: int, warmup: int) -> dict:
+    """Time every quality tier at full intensity and compare its output with ``best``."""
+    results = {}
+    for size in sizes:
+        image = np.asarray(synthetic_image(size))
+        for style in styles:
+            reference = ImageProcessor.process_array(image, style, 1.0, "RGB")
+            for quality in QUALITIES:
+                def run():
+                    return ImageProcessor.process_array(image, style, 1.0, "RGB", quality=quality)
+
+                for _ in range(warmup):
+                    run()
+
+                durations = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    output = run()
+                    durations.append(time.perf_counter() - start)
+
+                tracemalloc.start()
+                run()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+
+                key = f"{style}@{size}@{quality}"
+                results[key] = _summarize(durations, peak)
+                # Identical images have infinite PSNR, stored as null
+                psnr = cv2.PSNR(reference, output) if np.any(reference != output) else None
+                results[key]["psnr_db"] = None if psnr is None else round(psnr, 2)
+                _print_case(key, results[key])
+    return results
+
+
+async def _bench_api(styles, sizes, intensities, repeat: int, warmup: int) -> dict:
+    import httpx
+
+    # Every repeat must do the full work, so the result cache is disabled
+    os.environ["ZAINVISION_CACHE_MAX_BYTES"] = "0"
+    os.environ.pop("ZAINVISION_CACHE_DIR", None)
+    import main
+
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in sizes:
+            buffer = io.BytesIO()
+            synthetic_image(size).save(buffer, format="JPEG", quality=90)
+            upload = buffer.getvalue()
+            for style in styles:
+                for intensity in intensities:
+                    params = {"style": style, "intensity": intensity, "max_size": size}
+
+                    async def request():
+                        response = await client.post(
+                            "/process-image", params=params,
+                            files={"file": ("bench.jpg", upload, "image/jpeg")}
+                        )
+                        response.raise_for_status()
+
+                    for _ in range(warmup):
+                        await request()
+
+                    durations = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        await request()
+                        durations.append(time.perf_counter() - start)
+
+                    tracemalloc.start()
+                    await request()
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                    key = f"{style}@{size}@{intensity}"
+                    results[key] = _summarize(durations, peak)
+                    _print_case(key, results[key])
+    main.worker_pool.shutdown()
+    return results
+
+
+def bench_api(styles, sizes, intensities, repeat: int, warmup: int) -> dict:
+    """Time ``POST /process-image`` in-process for every case."""
+    return asyncio.run(_bench_api(styles, sizes, intensities, repeat, warmup))
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(f"{field}:"):
+                return int(line.split()[1]) / 1024
+    raise RuntimeError(f"{field} not found in /proc/self/status")
+
+
+async def _post_image(app, params: dict, upload: bytes, upload_format: str) -> tuple:
+    """Send one ``POST /process-image`` to ``app``, returning the status and the response size."""
+    boundary = "zainvision-bench"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; "
+        f"filename=\"bench.{upload_format}\"\r\nContent-Type: image/{upload_format}\r\n\r\n"
+    ).encode() + upload + f"\r\n--{boundary}--\r\n".encode()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+        "scheme": "http", "path": "/process-image", "raw_path": b"/process-image",
+        "query_string": urlencode(params).encode(), "root_path": "",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode()),
+                    (b"content-length", str(len(body)).encode())],
+        "server": ("bench", 80), "client": ("bench", 1),
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    del body
+    response = {"status": None, "bytes": 0}
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        # The body is only counted, so no client-side copy adds to the peak
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return response["status"], response["bytes"]
+
+
+async def _measure_request(style: str, size: int, upload_format: str, max_size: int) -> dict:
+    # Every case must do the full work
+    os.environ["ZAINVISION_CACHE_MAX_BYTES"] = "0"
+    os.environ["ZAINVISION_RENDER_CACHE_MAX_BYTES"] = "0"
+    os.environ.pop("ZAINVISION_CACHE_DIR", None)
+    import main
+
+    buffer = io.BytesIO()
+    synthetic_image(size).save(buffer, format=upload_format.upper())
+    upload = buffer.getvalue()
+    params = {"style": style, "intensity": 0.5}
+    if max_size:
+        params["max_size"] = max_size
+
+    # First calls allocate OpenCV and codec state that is kept for the process
+    small = io.BytesIO()
+    synthetic_image(64).save(small, format=upload_format.upper())
+    await _post_image(main.app, params, small.getvalue(), upload_format)
+
+    del buffer
+    gc.collect()
+    # Writing 5 resets the peak resident set size to the current one
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = _status_mb("VmRSS")
+    status, output_bytes = await _post_image(main.app, params, upload, upload_format)
+    if status != 200:
+        raise RuntimeError(f"{style}@{size}: HTTP {status}")
+    return {
+        "peak_rss_mb": round(_status_mb("VmHWM") - baseline, 1),
+        "upload_mb": round(len(upload) / 2**20, 2),
+        "output_mb": round(output_bytes / 2**20, 2),
+    }
+
+
+def bench_memory(styles, sizes, upload_format: str, max_size: int = None) -> dict:
+    """Measure the peak memory of ``POST /process-image``, in a fresh interpreter per case."""
+    results = {}
+    for size in sizes:
+        for style in styles:
+            case = json.dumps([style, size, upload_format, max_size])
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--memory-case", case],
+                capture_output=True, text=True, check=True
+            ).stdout
+            key = f"{style}@{size}@{upload_format}"
+            results[key] = json.loads(output.splitlines()[-1])
+            print(f"{key:<32} peak {results[key]['peak_rss_mb']:>8.1f} MiB  "
+                  f"upload {results[key]['upload_mb']:>7.2f} MiB  output {results[key]['output_mb']:>7.2f} MiB")
+    return results
+
+
+def _print_case(key: str, result: dict):
+    line = (f"{key:<32} p50 {result['p50_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  "
+            f"{result['throughput_per_s']:>8.2f}/s  peak {result['peak_mem_mb']:>7.2f} MB")
+    if "frames_per_s" in result:
+        line += f"  {result['frames_per_s']:>9.1f} fps (loop {result['loop_frames_per_s']:.1f})"
+    if "psnr_db" in result:
+        psnr = result["psnr_db"]
+        line += "  PSNR exact" if psnr is None else f"  PSNR {psnr:>6.2f} dB"
+    print(line)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Return the cases whose p50 latency grew by more than ``threshold``
+    (a fraction, 0.2 = 20%) relative to the baseline.
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get(key)
+        if not previous:
+            continue
+        # Memory results have no latency, so their peak is compared instead
+        metric = "p50_ms" if "p50_ms" in result else "peak_rss_mb"
+        ratio = result[metric] / max(previous[metric], 1e-6)
+        if ratio > 1 + threshold:
+            regressions.append((key, metric, previous[metric], result[metric], ratio))
+    return regressions
+
+
+def _parse_list(value: str, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark ZainVision styles.")
+    parser.add_argument("--mode", choices=("processor", "api", "batch", "quality", "memory"),
+                        default="processor")
+    parser.add_argument("--styles", help="Comma-separated styles (default: all)")
+    parser.add_argument("--sizes", default="256,512,1024",
+                        help="Comma-separated longest sides of the synthetic images")
+    parser.add_argument("--intensities", default="0.5,1.0", help="Comma-separated intensities")
+    parser.add_argument("--repeat", type=int, default=10, help="Timed runs per case")
+    parser.add_argument("--warmup", type=int, default=2, help="Untimed runs per case")
+    parser.add_argument("--batch-size", type=int, default=32, help="Frames per stack in batch mode")
+    parser.add_argument("--upload-format", choices=("jpeg", "png", "webp"), default="jpeg",
+                        help="Format of the uploads in memory mode")
+    parser.add_argument("--max-size", type=int,
+                        help="max_size of the requests in memory mode (default: the server's)")
+    parser.add_argument("--memory-case", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against this JSON results file")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed p50 slowdown against the baseline (0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    if args.memory_case:
+        print(json.dumps(asyncio.run(_measure_request(*json.loads(args.memory_case)))))
+        return 0
+
+    if args.styles:
+        styles = _parse_list(args.styles, str)
+    elif args.mode == "quality":
+        styles = [style for style in ImageProcessor.get_available_styles()
+                  if get_style(style).quality_params]
+    else:
+        styles = ImageProcessor.get_available_styles()
+    sizes = _parse_list(args.sizes, int)
+    intensities = _parse_list(args.intensities, float)
+
+    # Every repeat must do the full work, so renderings are not reused across runs
+    os.environ["ZAINVISION_RENDER_CACHE_MAX_BYTES"] = "0"
+    ImageProcessor.render_cache = RenderCache(max_bytes=0)
+
+    if args.mode == "batch":
+        results = bench_batch(styles, sizes, intensities, args.repeat, args.warmup, args.batch_size)
+    elif args.mode == "quality":
+        results = bench_quality(styles, sizes, args.repeat, args.warmup)
+    elif args.mode == "memory":
+        results = bench_memory(styles, sizes, args.upload_format, args.max_size)
+    else:
+        runner = bench_api if args.mode == "api" else bench_processor
+        results = runner(styles, sizes, intensities, args.repeat, args.warmup)
+
+    report = {
+        "meta": {
+            "mode": args.mode,
+            "repeat": args.repeat,
+            "batch_size": args.batch_size if args.mode == "batch" else None,
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Wrote {len(results)} results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for key, metric, before, after, ratio in regressions:
+            print(f"REGRESSION {key}: {metric} {before:.2f} -> {after:.2f} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+Apply a style or a pipeline to whole directories of images, offline.
+
+Inputs are directories (walked recursively) or glob patterns. Each file is
+read, styled and encoded inside a pool of worker processes, one per core,
+and written under the output directory with the same relative path and the
+extension of the output format. Only a bounded number of files is in flight
+at once, so memory does not grow with the number of inputs.
+
+GIFs are styled frame by frame into GIFs, and video files into MPEG-4
+videos without their audio. Their frames are streamed through the worker's
+thread pool a few at a time, so a long video never sits in memory.
+
+Every finished file is appended to a JSON-lines manifest. A later run with
+the same settings skips files whose manifest entry matches their current
+size and modification time; files without an entry are skipped when their
+output is newer than the input. An interrupted run therefore resumes where
+it stopped; on Ctrl+C the files being processed are finished first.
+
+Usage (from the backend directory):
+    python bulk.py photos/ --output styled/ --style watercolor --intensity 0.8
+    python bulk.py "scans/**/*.png" --output out/ --steps "sepia:0.8,vintage" --format jpeg --quality 90
+    python bulk.py photos/ --output styled/ --style cartoon --render-quality fast --max-size 0
+    python bulk.py clips/ --output styled/ --style pencil_sketch --max-size 720
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+import config
+from processors.filters import QUALITIES
+from processors.image_processor import ImageProcessor
+from processors.render_cache import RenderCache
+from processors.tiling import set_pool_size
+from services.animation import render_animation, render_video
+from services.rendering import OUTPUT_FORMATS, encode_image, load_image
+from services.steps import parse_steps, quantize_intensity
+
+# Animations and videos keep their kind of output whatever the output format
+ANIMATION_EXTENSIONS = (".gif",)
+VIDEO_EXTENSIONS = (".mp4", ".mov", ".m4v", ".avi", ".mkv", ".webm")
+
+# Files picked up from directories; glob patterns match whatever they name
+INPUT_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff",
+                    *ANIMATION_EXTENSIONS, *VIDEO_EXTENSIONS)
+
+# File extension written for each output format
+_EXTENSIONS = {"png": ".png", "jpeg": ".jpg", "webp": ".webp"}
+
+# Seconds between progress lines
+_PROGRESS_INTERVAL = 2.0
+
+# Frames of an animation or video decoded ahead of a worker's single frame thread
+_FRAME_LOOKAHEAD = 2
+
+
+def _init_worker():
+    # Ctrl+C reaches the whole process group; the main process decides how to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Every file is different, so full-strength renderings would never be reused
+    ImageProcessor.render_cache = RenderCache(max_bytes=0)
+    # Each core already runs its own worker; OpenCV's threads and the frame
+    # pool's would only compete with them
+    cv2.setNumThreads(1)
+    set_pool_size(1)
+
+
+def process_file(source: str, target: str, steps: tuple, max_size: int, fmt: str,
+                 quality: int = None, render_quality: str = "best") -> int:
+    """
+    Style one file and write the result, replacing ``target`` atomically.
+
+    Runs in a worker process, so it takes paths rather than image data.
+
+    Args:
+        source (str): Input image path
+        target (str): Output path
+        steps (tuple): Ordered (style, intensity) pairs
+        max_size (int): Maximum width or height of the processed image
+        fmt (str): Output format of still images, one of ``OUTPUT_FORMATS``
+        quality (int): Encoder setting, see ``encode_image``
+        render_quality (str): Speed/quality tier of the expensive styles
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+    # Keep the extension, which picks the container of a video
+    base, extension = os.path.splitext(target)
+    partial = f"{base}.{os.getpid()}.part{extension}"
+    kind = os.path.splitext(source)[1].lower()
+
+    if kind in VIDEO_EXTENSIONS:
+        render_video(source, partial, steps, max_size, render_quality, _FRAME_LOOKAHEAD)
+    else:
+        with open(source, "rb") as f:
+            contents = f.read()
+        if kind in ANIMATION_EXTENSIONS:
+            with open(partial, "wb") as f:
+                for chunk in render_animation(contents, steps, max_size, render_quality,
+                                              _FRAME_LOOKAHEAD, max_frames=None):
+                    f.write(chunk)
+        else:
+            image = load_image(contents, max_size)
+            if len(steps) == 1:
+                style, intensity = steps[0]
+                # Large images are not tiled: every core is already busy with a file of its own
+                image = ImageProcessor.process_image(image, style, intensity, None, render_quality,
+                                                     scratch=True)
+            else:
+                image = ImageProcessor.process_pipeline(image, steps, render_quality)
+            with open(partial, "wb") as f:
+                f.write(encode_image(image, fmt, quality))
+
+    size = os.path.getsize(partial)
+    os.replace(partial, target)
+    return size
+
+
+def output_name(relative: str, fmt: str) -> str:
+    """Return the output path of an input path, with the extension of what it becomes."""
+    stem, extension = os.path.splitext(relative)
+    extension = extension.lower()
+    if extension in VIDEO_EXTENSIONS:
+        return stem + ".mp4"
+    if extension in ANIMATION_EXTENSIONS:
+        return stem + ".gif"
+    return stem + _EXTENSIONS[fmt]
+
+
+def _glob_root(pattern: str) -> str:
+    """Return the directory a glob pattern's matches are taken relative to."""
+    parts = []
+    for part in pattern.split(os.sep):
+        if re.search(r"[*?[]", part):
+            break
+        parts.append(part)
+    else:
+        # A plain file path
+        return os.path.dirname(pattern)
+    return os.sep.join(parts) or "."
+
+
+def iter_inputs(paths: list, exclude: str = None):
+    """
+    Yield (file, root) for every input, lazily and in a stable order.
+
+    Directories are walked recursively for files with an ``INPUT_EXTENSIONS``
+    extension; anything else is treated as a glob pattern. ``root`` is the
+    directory output paths are made relative to. ``exclude`` (the output
+    directory) is never descended into.
+    """
+    exclude = os.path.abspath(exclude) if exclude else None
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames[:] = sorted(
+                    name for name in dirnames
+                    if os.path.abspath(os.path.join(dirpath, name)) != exclude
+                )
+                for name in sorted(filenames):
+                    if name.lower().endswith(INPUT_EXTENSIONS):
+                        yield os.path.join(dirpath, name), path
+        else:
+            root = _glob_root(path)
+            for match in sorted(glob.iglob(path, recursive=True)):
+                if os.path.isfile(match):
+                    yield match, root
+
+
+def load_manifest(path: str) -> dict:
+    """Return the latest manifest entry of every input, keyed by absolute input path."""
+    entries = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short when an earlier run was killed
+                    continue
+                entries[entry["input"]] = entry
+    return entries
+
+
+def _up_to_date(source: str, target: str, stat, key: str, manifest: dict) -> bool:
+    entry = manifest.get(os.path.abspath(source))
+    if entry is not None:
+        return (entry["status"] == "done" and entry["key"] == key
+                and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+                and os.path.exists(target))
+    try:
+        return os.stat(target).st_mtime_ns >= stat.st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+class Progress:
+    """Counts processed, skipped and failed files and prints the rate every few seconds."""
+
+    def __init__(self, stream=sys.stderr):
+        self.stream = stream
+        self.done = 0
+        self.skipped = 0
+        self.failed = 0
+        self.start = time.perf_counter()
+        self._last = self.start
+
+    def line(self) -> str:
+        elapsed = time.perf_counter() - self.start
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        return (f"{self.done} done, {self.skipped} skipped, {self.failed} failed, "
+                f"{rate:.1f} images/s, {elapsed:.0f} s")
+
+    def tick(self):
+        now = time.perf_counter()
+        if now - self._last >= _PROGRESS_INTERVAL:
+            self._last = now
+            print(self.line(), file=self.stream, flush=True)
+
+
+def _parse_steps(steps: str) -> tuple:
+    try:
+        return parse_steps(steps)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply a ZainVision style to many images.")
+    parser.add_argument("inputs", nargs="+", help="Input directories or glob patterns")
+    parser.add_argument("--output", required=True, help="Directory the results are written to")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--style", help="Style to apply")
+    target.add_argument("--steps", type=_parse_steps,
+                        help="Comma-separated style:intensity steps, e.g. 'sepia:0.8,vintage:0.5'")
+    parser.add_argument("--intensity", type=float, default=1.0, help="Intensity of --style (0.0 to 1.0)")
+    parser.add_argument("--format", choices=tuple(OUTPUT_FORMATS), default="png",
+                        help="Output format of still images (GIFs stay GIFs, videos become MP4)")
+    parser.add_argument("--quality", type=int, help="JPEG/WebP quality (1-100)")
+    parser.add_argument("--compress-level", type=int, help="PNG compression level (0-9)")
+    parser.add_argument("--max-size", type=int, default=config.MAX_IMAGE_SIZE,
+                        help="Longest side of the results in pixels, 0 to keep the original size")
+    parser.add_argument("--render-quality", choices=QUALITIES, default="best",
+                        help="Speed/quality tier of cartoon, watercolor and hdr_effect")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: one per core)")
+    parser.add_argument("--max-in-flight", type=int,
+                        help="Files queued or being processed at once (default: 2 x workers)")
+    parser.add_argument("--manifest", help="Manifest file (default: OUTPUT/.zainvision-manifest.jsonl)")
+    parser.add_argument("--force", action="store_true", help="Process files even if they are up to date")
+    args = parser.parse_args(argv)
+
+    if args.style and not 0.0 <= args.intensity <= 1.0:
+        parser.error("--intensity must be between 0.0 and 1.0")
+    # Checked here rather than by the encoder, which would fail every file
+    if args.format == "png":
+        if args.quality is not None:
+            parser.error("--quality applies to JPEG and WebP; use --compress-level for PNG")
+        if args.compress_level is not None and not 0 <= args.compress_level <= 9:
+            parser.error("--compress-level must be between 0 and 9")
+        setting = args.compress_level
+    else:
+        if args.compress_level is not None:
+            parser.error("--compress-level applies to PNG; use --quality for JPEG and WebP")
+        if args.quality is not None and not 1 <= args.quality <= 100:
+            parser.error("--quality must be between 1 and 100")
+        setting = args.quality
+    # Quantized as the API does, so the results match it
+    steps = args.steps or ((args.style, quantize_intensity(args.intensity)),)
+    unknown = [style for style, _ in steps if style not in ImageProcessor.get_available_styles()]
+    if unknown:
+        parser.error(f"Unknown styles: {', '.join(unknown)}")
+    workers = max(1, args.workers)
+    max_in_flight = max(1, args.max_in_flight or 2 * workers)
+    max_size = args.max_size or sys.maxsize
+    manifest_path = args.manifest or os.path.join(args.output, ".zainvision-manifest.jsonl")
+    # Outputs made with other settings are stale
+    key = json.dumps([steps, args.max_size, args.format, setting, args.render_quality])
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+    progress = Progress()
+    pending = {}
+
+    def collect(futures):
+        for future in futures:
+            source, stat = pending.pop(future)
+            entry = {"input": os.path.abspath(source), "key": key,
+                     "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            try:
+                entry.update(status="done", bytes=future.result())
+                progress.done += 1
+            except Exception as e:
+                entry.update(status="failed", error=str(e))
+                progress.failed += 1
+                print(f"Failed {source}: {e}", file=sys.stderr, flush=True)
+            manifest_file.write(json.dumps(entry) + "\n")
+            manifest_file.flush()
+
+    interrupted = False
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool, \
+            open(manifest_path, "a") as manifest_file:
+        try:
+            for source, root in iter_inputs(args.inputs, exclude=args.output):
+                target = os.path.join(args.output, output_name(os.path.relpath(source, root),
+                                                                args.format))
+                stat = os.stat(source)
+                if not args.force and _up_to_date(source, target, stat, key, manifest):
+                    progress.skipped += 1
+                    continue
+
+                # Wait for a free slot, so only a bounded number of files is held at once
+                while len(pending) >= max_in_flight:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                    progress.tick()
+                future = pool.submit(process_file, source, target, steps, max_size, args.format,
+                                     setting, args.render_quality)
+                pending[future] = (source, stat)
+
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                progress.tick()
+        except KeyboardInterrupt:
+            interrupted = True
+            print("Interrupted, finishing the files in progress; run again to resume",
+                  file=sys.stderr, flush=True)
+            for future in list(pending):
+                if future.cancel():
+                    del pending[future]
+            collect(wait(pending).done)
+
+    print(progress.line(), file=sys.stderr)
+    if interrupted:
+        return 130
+    return 1 if progress.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
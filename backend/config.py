@@ -0,0 +1,87 @@
+import os
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment, falling back to a default."""
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+# Worker pool used for the CPU-bound image processing stages
+WORKER_KIND = os.getenv("ZAINVISION_WORKER_KIND", "thread")  # "thread" or "process"
+MAX_WORKERS = _env_int("ZAINVISION_MAX_WORKERS", os.cpu_count() or 1)
+MAX_QUEUE = _env_int("ZAINVISION_MAX_QUEUE", MAX_WORKERS * 2)
+RETRY_AFTER_SECONDS = _env_int("ZAINVISION_RETRY_AFTER", 1)
+
+# Content-addressed cache for processed results
+CACHE_MAX_BYTES = _env_int("ZAINVISION_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+CACHE_DIR = os.getenv("ZAINVISION_CACHE_DIR") or None
+CACHE_DISK_MAX_BYTES = _env_int("ZAINVISION_CACHE_DISK_MAX_BYTES", 512 * 1024 * 1024)
+INTENSITY_STEP = 0.01  # Intensities are quantized to this step for processing and caching
+
+# Run every style once on a tiny image at startup, so one-time initialisation
+# inside OpenCV and PIL does not land on the first request
+WARMUP = _env_int("ZAINVISION_WARMUP", 0)
+
+# Admission control: the estimated peak memory of requests in flight is held
+# to MEMORY_BUDGET_BYTES; requests that do not fit wait up to
+# MEMORY_WAIT_SECONDS for room and are then rejected with a 503
+MEMORY_BUDGET_BYTES = _env_int("ZAINVISION_MEMORY_BUDGET", 768 * 1024 * 1024)
+MEMORY_WAIT_SECONDS = _env_int("ZAINVISION_MEMORY_WAIT", 10)
+
+# Animations: frames styled ahead of the encoder (memory grows with this, not
+# with the length of the animation) and the most frames processed per upload
+ANIMATION_LOOKAHEAD = _env_int("ZAINVISION_ANIMATION_LOOKAHEAD", 2 * (os.cpu_count() or 1))
+MAX_ANIMATION_FRAMES = _env_int("ZAINVISION_MAX_ANIMATION_FRAMES", 500)
+
+# Longest chain accepted by /process-pipeline
+MAX_PIPELINE_STEPS = _env_int("ZAINVISION_MAX_PIPELINE_STEPS", 16)
+
+# Most files accepted by /batch/images in one request
+MAX_BATCH_FILES = _env_int("ZAINVISION_MAX_BATCH_FILES", 32)
+
+# Decoded images are shrunk to fit MAX_IMAGE_SIZE unless a request asks for a
+# different size, which may not exceed MAX_IMAGE_SIZE_LIMIT
+MAX_IMAGE_SIZE = _env_int("ZAINVISION_MAX_IMAGE_SIZE", 1024)
+MAX_IMAGE_SIZE_LIMIT = _env_int("ZAINVISION_MAX_IMAGE_SIZE_LIMIT", 4096)
+FAST_RESAMPLE_FACTOR = 3.0  # Downscales at least this large use the cheaper resize path
+
+# Uploads whose header declares more pixels than this are rejected with a 413
+# before they are decoded
+MAX_INPUT_PIXELS = _env_int("ZAINVISION_MAX_INPUT_PIXELS", 100_000_000)
+
+# Encoder defaults; PNG no longer uses optimize=True, which roughly doubles encode time
+PNG_COMPRESS_LEVEL = _env_int("ZAINVISION_PNG_COMPRESS_LEVEL", 6)
+JPEG_QUALITY = _env_int("ZAINVISION_JPEG_QUALITY", 85)
+WEBP_QUALITY = _env_int("ZAINVISION_WEBP_QUALITY", 80)
+WEBP_METHOD = _env_int("ZAINVISION_WEBP_METHOD", 4)  # 0 (fastest) to 6 (smallest)
+
+# Images larger than this are styled in parallel tiles of this size
+TILE_SIZE = _env_int("ZAINVISION_TILE_SIZE", 1024)
+
+# Preview mode: a small proxy rendered with a fast encoding, while the decoded
+# full-size source is kept for a short while for the follow-up full render
+PREVIEW_SIZE = _env_int("ZAINVISION_PREVIEW_SIZE", 256)
+PREVIEW_QUALITY = _env_int("ZAINVISION_PREVIEW_QUALITY", 70)
+SESSION_TTL_SECONDS = _env_int("ZAINVISION_SESSION_TTL", 300)
+SESSION_MAX_BYTES = _env_int("ZAINVISION_SESSION_MAX_BYTES", 256 * 1024 * 1024)
+
+# Full-strength renderings kept per scrubbing WebSocket connection (one per style)
+SCRUB_MAX_RENDERS = _env_int("ZAINVISION_SCRUB_MAX_RENDERS", 4)
+
+# Full-strength renderings of the expensive blend-based styles, cached per
+# worker process so other intensities of the same image only need a blend
+RENDER_CACHE_MAX_BYTES = _env_int("ZAINVISION_RENDER_CACHE_MAX_BYTES", 64 * 1024 * 1024)
+
+# Intensity sweeps: default longest side of each cell and the most
+# (style, intensity) cells one request may ask for
+SWEEP_CELL_SIZE = _env_int("ZAINVISION_SWEEP_CELL_SIZE", 320)
+MAX_SWEEP_CELLS = _env_int("ZAINVISION_MAX_SWEEP_CELLS", 60)
+
+# Asynchronous jobs: results are kept for JOB_TTL_SECONDS after they finish and
+# uploads plus results are held to JOB_MAX_BYTES. Jobs are kept in memory
+# unless JOB_DB names a SQLite file, and JOB_WORKERS of them run at a time.
+JOB_DB = os.getenv("ZAINVISION_JOB_DB") or None
+JOB_TTL_SECONDS = _env_int("ZAINVISION_JOB_TTL", 3600)
+JOB_MAX_BYTES = _env_int("ZAINVISION_JOB_MAX_BYTES", 256 * 1024 * 1024)
+JOB_WORKERS = _env_int("ZAINVISION_JOB_WORKERS", 1)
@@ -1,11 +1,84 @@
-import uvicorn
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List
+from fastapi import (
+    FastAPI, File, UploadFile, HTTPException, Query, Header, Path, WebSocket, WebSocketDisconnect
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
-from PIL import Image
-import io
-import gc
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+import config
+from processors.filters import QUALITIES
 from processors.image_processor import ImageProcessor
+from services.animation import animation_peak, count_frames, render_animation
+from services.archive import stream_zip
+from services.job_store import JobStoreFull, make_job_store
+from services.jobs import JobRunner
+from services.memory_budget import MemoryBudget, MemoryBudgetExceeded
+from services.metrics import observe_stages, render_metrics, server_timing
+from services.rendering import (
+    OUTPUT_FORMATS, ImageTooLarge, check_upload, estimate_peak, frame_nbytes, image_nbytes,
+    load_image, load_session, open_image, render_decoded, render_image, render_pipeline,
+    style_frames
+)
+from services.worker_pool import WorkerPool, PoolSaturated
+from services.result_cache import ResultCache, etag_matches
+from services.scrubbing import (
+    ScrubSession, decode_source, has_render_step, render_frame, render_source
+)
+from services.session_cache import SessionCache
+from services.steps import parse_steps, quantize_intensity
+from services.sweep import render_sheet, render_sweep_parts
+from services.warmup import warm_up
+
+# Pool that runs the CPU-bound decode/style/encode stages off the event loop
+worker_pool = WorkerPool(
+    max_workers=config.MAX_WORKERS,
+    max_queue=config.MAX_QUEUE,
+    kind=config.WORKER_KIND
+)
+
+# Estimated peak memory of the renders in flight, so concurrent large uploads
+# wait for room instead of running the process out of memory
+memory_budget = MemoryBudget(
+    max_bytes=config.MEMORY_BUDGET_BYTES,
+    timeout=config.MEMORY_WAIT_SECONDS
+)
+
+# Cache of encoded results keyed on upload hash and processing parameters
+result_cache = ResultCache(
+    max_bytes=config.CACHE_MAX_BYTES,
+    disk_dir=config.CACHE_DIR,
+    disk_max_bytes=config.CACHE_DISK_MAX_BYTES
+)
+
+# Decoded uploads kept between a preview and its follow-up full-quality render
+session_cache = SessionCache(
+    max_bytes=config.SESSION_MAX_BYTES,
+    ttl=config.SESSION_TTL_SECONDS
+)
+
+# Queue and results of asynchronous jobs, run a few at a time on the worker pool
+job_store = make_job_store(config.JOB_DB, max_bytes=config.JOB_MAX_BYTES, ttl=config.JOB_TTL_SECONDS)
+job_runner = JobRunner(
+    job_store, worker_pool, memory_budget,
+    concurrency=config.JOB_WORKERS,
+    retry_after=config.RETRY_AFTER_SECONDS
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.WARMUP:
+        # Prime OpenCV and the codecs in every worker before the first request
+        await asyncio.gather(*worker_pool.submit_batch(warm_up, [()] * worker_pool.max_workers))
+    # Pick up jobs queued before a restart (SQLite store only)
+    job_runner.notify()
+    yield
+    await job_runner.stop()
+    worker_pool.shutdown()
 
 app = FastAPI(
     title="ZainVision - Professional Image Processing API",
@@ -19,7 +92,8 @@ app = FastAPI(
     license_info={
         "name": "MIT License",
         "url": "https://opensource.org/licenses/MIT",
-    }
+    },
+    lifespan=lifespan
 )
 
 # Configure CORS for Streamlit frontend
@@ -40,58 +114,1161 @@ async def get_styles():
     """Get available image processing styles with descriptions."""
     return {
         "styles": ImageProcessor.get_available_styles(),
-        "descriptions": ImageProcessor.get_style_descriptions()
+        "descriptions": ImageProcessor.get_style_descriptions(),
+        "render_qualities": list(QUALITIES)
     }
 
+@app.get("/cache/stats")
+async def get_cache_stats():
+    """Get result cache hit/miss counters and memory usage."""
+    return result_cache.stats()
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Get per-style and per-stage latency histograms in Prometheus text format."""
+    cache_stats = result_cache.stats()
+    session_stats = session_cache.stats()
+    job_stats = job_store.stats()
+    budget_stats = memory_budget.stats()
+    # Worker processes keep their own render caches, so these count thread workers only
+    render_stats = ImageProcessor.render_cache.stats()
+    return render_metrics({
+        "zainvision_cache_hits_total": ("counter", "Result cache hits (memory and disk).",
+                                        cache_stats["hits"] + cache_stats["disk_hits"]),
+        "zainvision_cache_misses_total": ("counter", "Result cache misses.", cache_stats["misses"]),
+        "zainvision_cache_bytes": ("gauge", "Bytes held in the in-memory result cache.",
+                                   cache_stats["bytes"]),
+        "zainvision_worker_jobs": ("gauge", "Jobs running or queued on the worker pool.",
+                                   worker_pool.pending),
+        "zainvision_memory_reserved_bytes": ("gauge", "Estimated peak memory reserved by running requests.",
+                                             budget_stats["reserved_bytes"]),
+        "zainvision_memory_budget_bytes": ("gauge", "Memory budget for running requests.",
+                                           budget_stats["max_bytes"]),
+        "zainvision_memory_waiting": ("gauge", "Requests waiting for room in the memory budget.",
+                                      budget_stats["waiting"]),
+        "zainvision_memory_rejected_total": ("counter", "Requests rejected after waiting for the memory budget.",
+                                             budget_stats["rejected"]),
+        "zainvision_render_cache_hits_total": ("counter", "Full-strength renderings reused from the render cache.",
+                                               render_stats["hits"]),
+        "zainvision_render_cache_misses_total": ("counter", "Full-strength renderings computed.",
+                                                 render_stats["misses"]),
+        "zainvision_render_cache_bytes": ("gauge", "Bytes held in the render cache.",
+                                          render_stats["bytes"]),
+        "zainvision_sessions": ("gauge", "Preview sessions holding a decoded upload.",
+                                session_stats["sessions"]),
+        "zainvision_session_bytes": ("gauge", "Bytes held by preview sessions.",
+                                     session_stats["bytes"]),
+        "zainvision_jobs_queued": ("gauge", "Asynchronous jobs waiting to run.",
+                                   job_stats["jobs"]["queued"]),
+        "zainvision_jobs_running": ("gauge", "Asynchronous jobs running.",
+                                    job_stats["jobs"]["running"]),
+        "zainvision_job_bytes": ("gauge", "Bytes of uploads and results held by the job store.",
+                                 job_stats["bytes"]),
+    })
+
+async def _read_upload(file: UploadFile, timings: dict, spooled: bool = False):
+    """
+    Read an uploaded file, recording the time taken as the ``read`` stage.
+
+    With ``spooled``, the file the upload was spooled to is returned instead
+    of being read into memory, and is hashed and decoded straight from it.
+    Only requests that are done with the upload before they return may ask
+    for this, since the file is closed then, and only with thread workers,
+    which can share it. The header check runs in a thread, as the file may
+    be on disk.
+
+    Raises:
+        HTTPException: 413 if the image header declares more than
+            ``MAX_INPUT_PIXELS`` pixels
+    """
+    start = time.perf_counter()
+    if spooled and worker_pool.kind == "thread":
+        contents = file.file
+    else:
+        contents = await file.read()
+    try:
+        await run_in_threadpool(check_upload, contents)
+    except ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    timings["read"] = (time.perf_counter() - start) * 1000
+    return contents
+
+def _parse_steps(steps: str) -> tuple:
+    """
+    Parse a pipeline description, see ``services.steps.parse_steps``.
+
+    Raises:
+        HTTPException: If the description is malformed or too long
+    """
+    try:
+        return parse_steps(steps, config.MAX_PIPELINE_STEPS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _parse_intensities(intensities: str) -> tuple:
+    """
+    Parse a comma-separated intensity list such as ``"0.2,0.5,1"``.
+
+    Raises:
+        HTTPException: If an intensity is malformed or outside 0.0 to 1.0
+    """
+    parsed = []
+    for item in intensities.split(","):
+        try:
+            value = float(item)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid intensity '{item.strip()}'")
+        if not 0.0 <= value <= 1.0:
+            raise HTTPException(status_code=400, detail=f"Intensity {value} is outside 0.0 to 1.0")
+        parsed.append(quantize_intensity(value))
+    return tuple(dict.fromkeys(parsed))
+
+def _check_render_quality(render_quality: str) -> str:
+    """
+    Validate a speed/quality tier.
+
+    Raises:
+        HTTPException: If the tier is unknown
+    """
+    if render_quality not in QUALITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown render quality '{render_quality}', use one of: {', '.join(QUALITIES)}"
+        )
+    return render_quality
+
+def _saturated(error: Exception) -> HTTPException:
+    """Build the 503 response sent when the worker pool or the memory budget is full."""
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)}
+    )
+
+def _parse_styles(styles: str) -> list:
+    """
+    Parse a comma-separated style list, defaulting to every available style.
+
+    Raises:
+        HTTPException: If a style is not available
+    """
+    available = ImageProcessor.get_available_styles()
+    if not styles:
+        return available
+    selected = list(dict.fromkeys(style.strip() for style in styles.split(",") if style.strip()))
+    unknown = [style for style in selected if style not in available]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown styles: {', '.join(unknown)}")
+    return selected
+
+def _style_label(style: str) -> str:
+    """
+    Metric label of a style. Unknown styles leave the image untouched and
+    are recorded as "original", so query strings cannot add label values.
+    """
+    return style if style in ImageProcessor.get_available_styles() else "original"
+
+def _negotiate_output(output_format: str, quality: int, compress_level: int, accept: str) -> tuple:
+    """
+    Pick the output format and encoder setting for a request.
+
+    An explicit ``format`` wins. Otherwise the Accept header is honoured,
+    preferring the supported type with the highest q-value, and PNG is used
+    for wildcards or when nothing supported is listed.
+
+    Returns:
+        tuple: (format, encoder setting) with defaults resolved, so equal
+        requests produce equal cache keys
+
+    Raises:
+        HTTPException: If an explicit format is not supported
+    """
+    if output_format:
+        output_format = output_format.lower().replace("jpg", "jpeg")
+        if output_format not in OUTPUT_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported format '{output_format}', use one of: {', '.join(OUTPUT_FORMATS)}"
+            )
+    else:
+        output_format = "png"
+        best_q = 0.0
+        media_types = {media_type: fmt for fmt, media_type in OUTPUT_FORMATS.items()}
+        for item in (accept or "").split(","):
+            media_type, *params = [part.strip() for part in item.split(";")]
+            q = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        q = float(param[2:])
+                    except ValueError:
+                        q = 0.0
+            if media_type in media_types and q > best_q:
+                output_format, best_q = media_types[media_type], q
+
+    if output_format == "png":
+        return output_format, config.PNG_COMPRESS_LEVEL if compress_level is None else compress_level
+    if output_format == "jpeg":
+        return output_format, quality or config.JPEG_QUALITY
+    return output_format, quality or config.WEBP_QUALITY
+
+def _negotiate_preview(output_format: str, quality: int, compress_level: int) -> tuple:
+    """
+    Pick the output format and encoder setting for a preview.
+
+    Previews favour encoding speed, so they are JPEG at the preview quality
+    unless a format is given explicitly.
+    """
+    if output_format:
+        return _negotiate_output(output_format, quality, compress_level, None)
+    return "jpeg", quality or config.PREVIEW_QUALITY
+
+async def _make_key(contents, *params) -> str:
+    """
+    ``ResultCache.make_key`` in a thread, since hashing a multi-megabyte
+    upload (possibly from its spooled file on disk) would block the event loop.
+    """
+    return await run_in_threadpool(ResultCache.make_key, contents, *params)
+
+async def _image_cache_key(contents, style: str, intensity: float, max_size: int,
+                           output: tuple = ("png", config.PNG_COMPRESS_LEVEL),
+                           render_quality: str = "best") -> str:
+    """Cache key of a single-style result, shared by /process-image and the batch endpoints."""
+    return await _make_key(
+        contents, render_image.__name__, style, intensity, max_size, *output, render_quality
+    )
+
+async def _batch_entries(cached: dict, jobs: dict, cache_keys: dict, styles: dict):
+    """
+    Yield (archive name, PNG bytes) for a batch, serving cache hits first.
+
+    ``jobs`` maps the names that missed the cache to their worker futures;
+    those are yielded as they complete, stored in the result cache and
+    recorded in the latency metrics under the style in ``styles``. The
+    response has started by then, so a job that fails is written as a
+    ``<name>.error.txt`` entry holding the error, keeping the archive valid.
+    """
+    for name, png_bytes in cached.items():
+        yield name, png_bytes
+
+    async def labelled(name, future):
+        try:
+            return name, await future, None
+        except Exception as e:
+            return name, None, e
+
+    for next_done in asyncio.as_completed([labelled(n, f) for n, f in jobs.items()]):
+        name, result, error = await next_done
+        if error is not None:
+            yield f"{os.path.splitext(name)[0]}.error.txt", str(error).encode()
+            continue
+        png_bytes, stages = result
+        result_cache.put(cache_keys[name], png_bytes)
+        observe_stages(styles[name], stages)
+        yield name, png_bytes
+
+def _zip_response(entries, filename: str) -> StreamingResponse:
+    """Stream batch results to the client as a zip archive."""
+    return StreamingResponse(
+        stream_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+def _concurrent_peak(peaks: list) -> float:
+    """Peak of running work with the given peaks on the worker pool, as many at a time as it has workers."""
+    return sum(sorted(peaks, reverse=True)[:worker_pool.max_workers])
+
+def _release_after(futures: list, reserved: int):
+    """Return a memory reservation once every future of a batch has finished."""
+    asyncio.gather(*futures, return_exceptions=True).add_done_callback(
+        lambda _: memory_budget.release(reserved)
+    )
+
+async def _stream_reserved(chunks, reserved: int, label: str):
+    """
+    Stream a synchronous generator from a thread, releasing ``reserved`` bytes once it ends.
+
+    The total time is recorded in the metrics under ``label`` as the ``stream`` stage.
+    """
+    start = time.perf_counter()
+    try:
+        async for chunk in iterate_in_threadpool(chunks):
+            yield chunk
+        observe_stages(label, {"stream": (time.perf_counter() - start) * 1000})
+    finally:
+        # Stops the frames still queued if the client went away
+        chunks.close()
+        memory_budget.release(reserved)
+
+async def _run_job(timings: dict, job, *args, reserve: int = 0):
+    """
+    Run ``job(*args)`` on the worker pool and return its result.
+
+    ``job`` returns its result together with its stage timings, which are
+    added to ``timings`` along with the time spent waiting for a worker.
+    ``reserve`` bytes of the memory budget are held while the job runs; the
+    time spent waiting for them is recorded as the ``admit`` stage.
+    """
+    start = time.perf_counter()
+    async with memory_budget.reserve(reserve):
+        if reserve:
+            timings["admit"] = timings.get("admit", 0.0) + (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        result, stages = await worker_pool.run(job, *args)
+    elapsed = (time.perf_counter() - start) * 1000
+    # Whatever the worker did not account for was spent waiting for it
+    timings["queue"] = timings.get("queue", 0.0) + max(0.0, elapsed - sum(stages.values()))
+    for name, duration in stages.items():
+        timings[name] = timings.get(name, 0.0) + duration
+    return result
+
+async def _serve_cached(cache_key: str, timings: dict, if_none_match: str, fmt: str,
+                        render, *args, label: str, headers: dict = None,
+                        media_type: str = None, reserve: int = 0) -> Response:
+    """
+    Return the cached result stored under ``cache_key``, running ``render(*args)`` on a miss.
+
+    A miss holds ``reserve`` bytes of the memory budget while it renders.
+
+    The response carries an ETag derived from the cache key, and a matching
+    If-None-Match short-circuits to 304 Not Modified. Per-stage timings are
+    sent as ``Server-Timing`` and recorded in the metrics under ``label``;
+    encode time and output size are also reported in ``X-Encode-Time`` (ms)
+    and ``X-Output-Bytes``. ``media_type`` overrides the type of ``fmt``.
+    """
+    try:
+        etag = f'"{cache_key}"'
+        headers = {"ETag": etag, "Vary": "Accept", **(headers or {})}
+
+        # The ETag is derived from the request itself, so a match needs no lookup
+        if etag_matches(if_none_match, etag):
+            headers["Server-Timing"] = server_timing(timings)
+            return Response(status_code=304, headers=headers)
+
+        start = time.perf_counter()
+        data = result_cache.get(cache_key)
+        timings["cache"] = (time.perf_counter() - start) * 1000
+        headers["X-Cache"] = "HIT"
+        if data is None:
+            encoded_before = timings.get("encode", 0.0)
+            data = await _run_job(timings, render, *args, reserve=reserve)
+            observe_stages(label, timings)
+            result_cache.put(cache_key, data)
+            headers["X-Cache"] = "MISS"
+            headers["X-Encode-Time"] = f"{timings['encode'] - encoded_before:.1f}"
+        headers["X-Output-Bytes"] = str(len(data))
+        headers["Server-Timing"] = server_timing(timings)
+
+        return Response(
+            content=data,
+            media_type=media_type or OUTPUT_FORMATS[fmt],
+            headers=headers
+        )
+
+    except (PoolSaturated, MemoryBudgetExceeded) as e:
+        raise _saturated(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _open_session(contents, max_size: int, timings: dict) -> tuple:
+    """
+    Return the id and decoded (image, proxy) pair of a preview session, decoding on a miss.
+
+    Session ids are derived from the upload and ``max_size``, so uploading the
+    same image again reuses a live session.
+    """
+    session_id = await _make_key(contents, load_session.__name__, max_size)
+    session = session_cache.get(session_id)
+    if session is None:
+        try:
+            session = await _run_job(timings, load_session, contents, max_size,
+                                     reserve=estimate_peak(contents, max_size, 1.0))
+        except (PoolSaturated, MemoryBudgetExceeded) as e:
+            raise _saturated(e)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        image, proxy = session
+        size = image_nbytes(image) + (image_nbytes(proxy) if proxy is not image else 0)
+        session_cache.put(session_id, session, size)
+    return session_id, session
+
+async def _serve_session(session_id: str, session: tuple, timings: dict, if_none_match: str,
+                         style: str, intensity: float, preview: bool, output: tuple,
+                         render_quality: str = "best") -> Response:
+    """Render a style from a session's full-size image, or from its proxy for a preview."""
+    image, proxy = session
+    source = proxy if preview else image
+    cache_key = ResultCache.make_key(
+        session_id.encode(), render_decoded.__name__, style, intensity, preview, *output,
+        render_quality
+    )
+    return await _serve_cached(
+        cache_key, timings, if_none_match, output[0],
+        render_decoded, source, style, intensity, *output, render_quality,
+        label="preview" if preview else _style_label(style),
+        headers={"X-Session-Id": session_id, "X-Preview": str(preview).lower()},
+        reserve=int(frame_nbytes(source) * style_frames(((style, intensity),), render_quality))
+    )
+
 @app.post("/process-image")
 async def process_image(
     file: UploadFile = File(...),
     style: str = Query("original", description="Style to apply to the image"),
-    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)")
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the processed image in pixels"),
+    output_format: str = Query(None, alias="format", description="Output format: png, jpeg or webp (default: from Accept, else png)"),
+    quality: int = Query(None, ge=1, le=100, description="JPEG/WebP quality (1-100)"),
+    compress_level: int = Query(None, ge=0, le=9, description="PNG compression level (0-9)"),
+    preview: bool = Query(False, description="Return a fast low-resolution preview and open a session for the full render"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best"),
+    accept: str = Header(None),
+    if_none_match: str = Header(None)
 ):
     """
     Process an uploaded image with the specified style and intensity.
 
+    Results are cached by upload content and parameters. Every response
+    carries an ETag, and a matching If-None-Match returns 304 Not Modified.
+
+    With ``preview`` the style is applied to a small proxy of the image and
+    encoded for speed (JPEG unless a format is given). The decoded upload is
+    kept in a short-lived session whose id is returned in ``X-Session-Id``;
+    ``GET /sessions/{session_id}/image`` then renders the full-quality result,
+    or further previews, without uploading the image again.
+
     Args:
         file (UploadFile): The image file to process
         style (str): Style to apply to the image
         intensity (float): Intensity of the effect (0.0 to 1.0)
+        max_size (int): Longest side of the processed image, deployment default if omitted
+        output_format (str): Output format, negotiated from the Accept header if omitted
+        quality (int): JPEG/WebP quality, deployment default if omitted
+        compress_level (int): PNG compression level, deployment default if omitted
+        preview (bool): Render a fast preview and open a session for follow-up renders
+        render_quality (str): Speed/quality tier of the expensive styles
+        accept (str): Accepted media types, used when no format is given
+        if_none_match (str): ETag(s) of results the client already holds
+
+    Returns:
+        Response: The processed image in the negotiated format
+    """
+    intensity = quantize_intensity(intensity)
+    max_size = max_size or config.MAX_IMAGE_SIZE
+    render_quality = _check_render_quality(render_quality)
+    timings = {}
+    if preview:
+        output = _negotiate_preview(output_format, quality, compress_level)
+        contents = await _read_upload(file, timings, spooled=True)
+        session_id, session = await _open_session(contents, max_size, timings)
+        return await _serve_session(
+            session_id, session, timings, if_none_match, style, intensity, True, output,
+            render_quality
+        )
+
+    output = _negotiate_output(output_format, quality, compress_level, accept)
+    contents = await _read_upload(file, timings, spooled=True)
+    return await _serve_cached(
+        await _image_cache_key(contents, style, intensity, max_size, output, render_quality),
+        timings, if_none_match,
+        output[0], render_image, contents, style, intensity, max_size, *output, render_quality,
+        label=_style_label(style),
+        reserve=estimate_peak(contents, max_size, style_frames(((style, intensity),), render_quality))
+    )
+
+@app.get("/sessions/{session_id}/image")
+async def render_session(
+    session_id: str = Path(..., description="Session id returned in X-Session-Id by a preview request"),
+    style: str = Query("original", description="Style to apply to the image"),
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    preview: bool = Query(False, description="Render the low-resolution preview instead of the full image"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best"),
+    output_format: str = Query(None, alias="format", description="Output format: png, jpeg or webp (default: from Accept, else png)"),
+    quality: int = Query(None, ge=1, le=100, description="JPEG/WebP quality (1-100)"),
+    compress_level: int = Query(None, ge=0, le=9, description="PNG compression level (0-9)"),
+    accept: str = Header(None),
+    if_none_match: str = Header(None)
+):
+    """
+    Render a style from an image uploaded earlier with ``preview=true``.
+
+    The session keeps the decoded image, so neither the upload nor the
+    decode is repeated. Each use extends the session's lifetime; once it has
+    expired the request fails with 404 and the image must be uploaded again.
+
+    Args:
+        session_id (str): Id returned in ``X-Session-Id`` by ``/process-image?preview=true``
+        style (str): Style to apply to the image
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        preview (bool): Render the fast low-resolution preview instead
+        render_quality (str): Speed/quality tier of the expensive styles
+        output_format (str): Output format, negotiated from the Accept header if omitted
+        quality (int): JPEG/WebP quality, deployment default if omitted
+        compress_level (int): PNG compression level, deployment default if omitted
+        accept (str): Accepted media types, used when no format is given
+        if_none_match (str): ETag(s) of results the client already holds
 
     Returns:
-        Response: The processed image as a PNG file
+        Response: The processed image in the negotiated format
     """
+    render_quality = _check_render_quality(render_quality)
+    if preview:
+        output = _negotiate_preview(output_format, quality, compress_level)
+    else:
+        output = _negotiate_output(output_format, quality, compress_level, accept)
+    session = session_cache.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session expired or unknown, upload the image again")
+    return await _serve_session(
+        session_id, session, {}, if_none_match, style, quantize_intensity(intensity), preview, output,
+        render_quality
+    )
+
+@app.post("/process-pipeline")
+async def process_pipeline(
+    file: UploadFile = File(...),
+    steps: str = Query(..., description="Comma-separated style:intensity steps, e.g. 'sepia:0.8,vintage:0.5'"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the processed image in pixels"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best"),
+    output_format: str = Query(None, alias="format", description="Output format: png, jpeg or webp (default: from Accept, else png)"),
+    quality: int = Query(None, ge=1, le=100, description="JPEG/WebP quality (1-100)"),
+    compress_level: int = Query(None, ge=0, le=9, description="PNG compression level (0-9)"),
+    accept: str = Header(None),
+    if_none_match: str = Header(None)
+):
+    """
+    Apply several styles to an uploaded image in a single request.
+
+    The image is decoded once, every step runs on the same in-memory array
+    (with adjacent point-wise styles fused into one pass) and the result is
+    encoded once. A step without an intensity uses 1.0.
+
+    Args:
+        file (UploadFile): The image file to process
+        steps (str): Ordered steps as ``style:intensity`` separated by commas
+        max_size (int): Longest side of the processed image, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+        output_format (str): Output format, negotiated from the Accept header if omitted
+        quality (int): JPEG/WebP quality, deployment default if omitted
+        compress_level (int): PNG compression level, deployment default if omitted
+        accept (str): Accepted media types, used when no format is given
+        if_none_match (str): ETag(s) of results the client already holds
+
+    Returns:
+        Response: The processed image in the negotiated format
+    """
+    parsed_steps = _parse_steps(steps)
+    max_size = max_size or config.MAX_IMAGE_SIZE
+    render_quality = _check_render_quality(render_quality)
+    output = _negotiate_output(output_format, quality, compress_level, accept)
+    timings = {}
+    contents = await _read_upload(file, timings, spooled=True)
+    cache_key = await _make_key(
+        contents, render_pipeline.__name__, parsed_steps, max_size, *output, render_quality
+    )
+    return await _serve_cached(
+        cache_key, timings, if_none_match, output[0],
+        render_pipeline, contents, parsed_steps, max_size, *output, render_quality,
+        label="pipeline",
+        reserve=estimate_peak(contents, max_size, style_frames(parsed_steps, render_quality))
+    )
+
+@app.post("/process-animation")
+async def process_animation(
+    file: UploadFile = File(...),
+    style: str = Query("original", description="Style to apply to every frame"),
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the frames in pixels"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best")
+):
+    """
+    Apply a style to every frame of an animated GIF, WebP or PNG and return an animated GIF.
+
+    Frames are decoded one at a time, styled in parallel a few frames
+    ahead and streamed back in order as soon as each one is encoded, so
+    memory depends on ``ZAINVISION_ANIMATION_LOOKAHEAD`` rather than on the
+    length of the animation. Frame timing is kept, and a frame identical
+    to the one before it is not styled again.
+
+    Args:
+        file (UploadFile): The animation to process; a still image gives a one-frame GIF
+        style (str): Style to apply to every frame
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        max_size (int): Longest side of the frames, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+
+    Returns:
+        StreamingResponse: The styled animation as a GIF
+    """
+    intensity = quantize_intensity(intensity)
+    max_size = max_size or config.MAX_IMAGE_SIZE
+    render_quality = _check_render_quality(render_quality)
+    contents = await _read_upload(file, {})
     try:
-        # Read and validate the image
-        contents = await file.read()
-        image = Image.open(io.BytesIO(contents))
+        frames = count_frames(contents)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if frames > config.MAX_ANIMATION_FRAMES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Animations are limited to {config.MAX_ANIMATION_FRAMES} frames"
+        )
 
-        # Resize large images to prevent memory issues
-        max_size = 1024
-        if max(image.size) > max_size:
-            ratio = max_size / max(image.size)
-            new_size = tuple(int(dim * ratio) for dim in image.size)
-            image = image.resize(new_size, Image.Resampling.LANCZOS)
+    steps = ((style, intensity),)
+    try:
+        reserved = await memory_budget.acquire(animation_peak(
+            contents, steps, max_size, config.ANIMATION_LOOKAHEAD, render_quality
+        ))
+    except MemoryBudgetExceeded as e:
+        raise _saturated(e)
+    chunks = render_animation(contents, steps, max_size, render_quality)
+    return StreamingResponse(
+        _stream_reserved(chunks, reserved, "animation"),
+        media_type="image/gif",
+        headers={"X-Frames": str(frames)}
+    )
 
-        # Process the image
-        processed_image = ImageProcessor.process_image(image, style, intensity)
+@app.post("/sweep")
+async def sweep(
+    file: UploadFile = File(...),
+    styles: str = Query(..., description="Comma-separated styles to sweep, one row each"),
+    intensities: str = Query("0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9,1.0", description="Comma-separated intensities, one column each"),
+    layout: str = Query("sheet", description="'sheet' for one contact-sheet image, 'multipart' for one part per cell"),
+    labels: bool = Query(True, description="Caption each contact-sheet cell with its style and intensity"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of each cell in pixels"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best"),
+    output_format: str = Query(None, alias="format", description="Output format: png, jpeg or webp (default: from Accept, else png)"),
+    quality: int = Query(None, ge=1, le=100, description="JPEG/WebP quality (1-100)"),
+    compress_level: int = Query(None, ge=0, le=9, description="PNG compression level (0-9)"),
+    accept: str = Header(None),
+    if_none_match: str = Header(None)
+):
+    """
+    Render styles at several intensities side by side to compare settings.
 
-        # Convert the processed image to bytes
-        img_byte_arr = io.BytesIO()
-        processed_image.save(img_byte_arr, format='PNG', optimize=True)
-        img_byte_arr = img_byte_arr.getvalue()
+    The image is decoded once and each blend-based style is rendered once at
+    full strength; every intensity is then a single blend of that rendering.
+    By default the cells are composed into one contact sheet (a row per
+    style, a column per intensity) that is encoded once. With
+    ``layout=multipart`` every cell is returned as its own part of a
+    ``multipart/mixed`` response instead.
 
-        # Clean up
-        del image
-        del processed_image
-        gc.collect()
+    Args:
+        file (UploadFile): The image file to process
+        styles (str): Comma-separated styles
+        intensities (str): Comma-separated intensities (0.0 to 1.0)
+        layout (str): ``sheet`` or ``multipart``
+        labels (bool): Caption the contact-sheet cells
+        max_size (int): Longest side of each cell, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+        output_format (str): Output format, negotiated from the Accept header if omitted
+        quality (int): JPEG/WebP quality, deployment default if omitted
+        compress_level (int): PNG compression level, deployment default if omitted
+        accept (str): Accepted media types, used when no format is given
+        if_none_match (str): ETag(s) of results the client already holds
 
-        return Response(
-            content=img_byte_arr,
-            media_type="image/png"
+    Returns:
+        Response: The contact sheet in the negotiated format, or a multipart body
+    """
+    selected = tuple(_parse_styles(styles))
+    parsed_intensities = _parse_intensities(intensities)
+    if layout not in ("sheet", "multipart"):
+        raise HTTPException(status_code=400, detail=f"Unknown layout '{layout}', use sheet or multipart")
+    if len(selected) * len(parsed_intensities) > config.MAX_SWEEP_CELLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Sweeps are limited to {config.MAX_SWEEP_CELLS} style/intensity cells"
         )
+    max_size = max_size or config.SWEEP_CELL_SIZE
+    render_quality = _check_render_quality(render_quality)
+    output = _negotiate_output(output_format, quality, compress_level, accept)
+    timings = {}
+    contents = await _read_upload(file, timings, spooled=True)
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    reserve = estimate_peak(contents, max_size, style_frames(
+        [(style, 1.0) for style in selected], render_quality,
+        outputs=len(selected) * len(parsed_intensities)
+    ))
+    headers = {
+        "X-Sweep-Styles": ",".join(selected),
+        "X-Sweep-Intensities": ",".join(f"{value:g}" for value in parsed_intensities)
+    }
+    if layout == "multipart":
+        cache_key = await _make_key(
+            contents, render_sweep_parts.__name__, selected, parsed_intensities, max_size, *output,
+            render_quality
+        )
+        # Derived from the cache key, so cached bodies stay valid
+        boundary = f"sweep-{cache_key[:32]}"
+        return await _serve_cached(
+            cache_key, timings, if_none_match, output[0],
+            render_sweep_parts, contents, selected, parsed_intensities, boundary, max_size, *output,
+            render_quality,
+            label="sweep", headers=headers, media_type=f"multipart/mixed; boundary={boundary}",
+            reserve=reserve
+        )
+
+    cache_key = await _make_key(
+        contents, render_sheet.__name__, selected, parsed_intensities, max_size, labels, *output,
+        render_quality
+    )
+    return await _serve_cached(
+        cache_key, timings, if_none_match, output[0],
+        render_sheet, contents, selected, parsed_intensities, max_size, labels, *output,
+        render_quality,
+        label="sweep", headers=headers, reserve=reserve
+    )
+
+@app.post("/batch/styles")
+async def batch_styles(
+    file: UploadFile = File(...),
+    styles: str = Query(None, description="Comma-separated styles to apply (default: all)"),
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the processed image in pixels"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best")
+):
+    """
+    Apply several styles to one uploaded image and return a zip of the results.
+
+    The image is decoded and resized once, then every style runs in parallel
+    on the worker pool. Results stream back as ``<style>.png`` entries.
+
+    Args:
+        file (UploadFile): The image file to process
+        styles (str): Comma-separated styles, all available styles if omitted
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        max_size (int): Longest side of the processed images, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+
+    Returns:
+        StreamingResponse: Zip archive with one PNG per style
+    """
+    selected = _parse_styles(styles)
+    intensity = quantize_intensity(intensity)
+    max_size = max_size or config.MAX_IMAGE_SIZE
+    render_quality = _check_render_quality(render_quality)
+    contents = await _read_upload(file, {})
+
+    cache_keys, cached, missing = {}, {}, {}
+    for style in selected:
+        name = f"{style}.png"
+        cache_keys[name] = await _image_cache_key(
+            contents, style, intensity, max_size, render_quality=render_quality
+        )
+        png_bytes = result_cache.get(cache_keys[name])
+        if png_bytes is None:
+            missing[name] = style
+        else:
+            cached[name] = png_bytes
+
+    jobs = {}
+    if missing:
+        # The image is decoded once and shared; only the styles running at once add up
+        frames = _concurrent_peak(
+            [style_frames(((style, intensity),), render_quality) for style in missing.values()]
+        )
+        try:
+            reserved = await memory_budget.acquire(estimate_peak(contents, max_size, frames))
+        except MemoryBudgetExceeded as e:
+            raise _saturated(e)
+        try:
+            image = await worker_pool.run(load_image, contents, max_size)
+            futures = worker_pool.submit_batch(
+                render_decoded,
+                [(image, style, intensity, "png", None, render_quality) for style in missing.values()]
+            )
+        except Exception as e:
+            memory_budget.release(reserved)
+            if isinstance(e, PoolSaturated):
+                raise _saturated(e)
+            raise HTTPException(status_code=500, detail=str(e))
+        _release_after(futures, reserved)
+        jobs = dict(zip(missing, futures))
+
+    styles = {f"{style}.png": style for style in selected}
+    return _zip_response(_batch_entries(cached, jobs, cache_keys, styles), "styles.zip")
+
+@app.post("/batch/images")
+async def batch_images(
+    files: List[UploadFile] = File(...),
+    style: str = Query("original", description="Style to apply to every image"),
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the processed image in pixels"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best")
+):
+    """
+    Apply one style to several uploaded images and return a zip of the results.
+
+    Each image is processed as its own job, in parallel on the worker pool.
+    Results stream back as ``<index>_<filename>.png`` entries. Every upload
+    is checked to be a readable image before anything is streamed.
+
+    Args:
+        files (List[UploadFile]): The image files to process
+        style (str): Style to apply to every image
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        max_size (int): Longest side of the processed images, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+
+    Returns:
+        StreamingResponse: Zip archive with one PNG per uploaded image
+    """
+    if len(files) > config.MAX_BATCH_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batches are limited to {config.MAX_BATCH_FILES} images"
+        )
+    intensity = quantize_intensity(intensity)
+    max_size = max_size or config.MAX_IMAGE_SIZE
+    render_quality = _check_render_quality(render_quality)
+
+    cache_keys, cached, missing = {}, {}, {}
+    for index, upload in enumerate(files):
+        contents = await _read_upload(upload, {})
+        try:
+            # Only the header is read; a bad file fails here rather than mid-archive
+            open_image(contents)
+        except Exception:
+            raise HTTPException(status_code=400, detail=f"Cannot read image '{upload.filename}'")
+        stem = os.path.splitext(os.path.basename(upload.filename or "image"))[0]
+        name = f"{index:03d}_{stem}.png"
+        cache_keys[name] = await _image_cache_key(
+            contents, style, intensity, max_size, render_quality=render_quality
+        )
+        png_bytes = result_cache.get(cache_keys[name])
+        if png_bytes is None:
+            missing[name] = contents
+        else:
+            cached[name] = png_bytes
+
+    jobs = {}
+    if missing:
+        frames = style_frames(((style, intensity),), render_quality)
+        peak = _concurrent_peak(
+            [estimate_peak(contents, max_size, frames) for contents in missing.values()]
+        )
+        try:
+            reserved = await memory_budget.acquire(int(peak))
+            futures = worker_pool.submit_batch(
+                render_image,
+                [(contents, style, intensity, max_size, "png", None, render_quality)
+                 for contents in missing.values()]
+            )
+        except MemoryBudgetExceeded as e:
+            raise _saturated(e)
+        except PoolSaturated as e:
+            memory_budget.release(reserved)
+            raise _saturated(e)
+        _release_after(futures, reserved)
+        jobs = dict(zip(missing, futures))
+
+    styles = dict.fromkeys(cache_keys, _style_label(style))
+    return _zip_response(_batch_entries(cached, jobs, cache_keys, styles), "images.zip")
+
+def _job_view(job: dict) -> dict:
+    """Public representation of a job, with links to poll it and fetch its result."""
+    view = {name: value for name, value in job.items() if name != "expires_at"}
+    view["progress"] = round(job["progress"], 3)
+    view["expires_in"] = (
+        None if job["expires_at"] is None else max(0.0, round(job["expires_at"] - time.time(), 1))
+    )
+    view["status_url"] = f"/jobs/{job['id']}"
+    view["result_url"] = f"/jobs/{job['id']}/result" if job["status"] == "done" else None
+    return view
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    style: str = Query(None, description="Style to apply (or use steps)"),
+    intensity: float = Query(1.0, ge=0.0, le=1.0, description="Intensity of the effect (0.0 to 1.0)"),
+    steps: str = Query(None, description="Comma-separated style:intensity steps, instead of style"),
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT, description="Longest side of the processed image in pixels"),
+    output_format: str = Query(None, alias="format", description="Output format: png, jpeg or webp (default: from Accept, else png)"),
+    quality: int = Query(None, ge=1, le=100, description="JPEG/WebP quality (1-100)"),
+    compress_level: int = Query(None, ge=0, le=9, description="PNG compression level (0-9)"),
+    render_quality: str = Query("best", description="Speed/quality tier of cartoon, watercolor and hdr_effect: fast, balanced or best"),
+    accept: str = Header(None)
+):
+    """
+    Queue a style or pipeline to be processed in the background.
+
+    The request returns straight away with the job's id; poll
+    ``GET /jobs/{job_id}`` for its status and progress and download the
+    result from ``GET /jobs/{job_id}/result`` once it is done. Results are
+    kept for a limited time and within a total size budget.
+
+    Args:
+        file (UploadFile): The image file to process
+        style (str): Style to apply, when ``steps`` is not given
+        intensity (float): Intensity of ``style`` (0.0 to 1.0)
+        steps (str): Ordered steps as ``style:intensity`` separated by commas
+        max_size (int): Longest side of the processed image, deployment default if omitted
+        output_format (str): Output format, negotiated from the Accept header if omitted
+        quality (int): JPEG/WebP quality, deployment default if omitted
+        compress_level (int): PNG compression level, deployment default if omitted
+        render_quality (str): Speed/quality tier of the expensive styles
+        accept (str): Accepted media types, used when no format is given
+
+    Returns:
+        JSONResponse: The queued job, with ``Location`` pointing at its status
+    """
+    if steps:
+        parsed_steps = _parse_steps(steps)
+    elif style:
+        parsed_steps = ((style, quantize_intensity(intensity)),)
+    else:
+        raise HTTPException(status_code=400, detail="Give either style or steps")
+    fmt, setting = _negotiate_output(output_format, quality, compress_level, accept)
+    params = {
+        "steps": [list(step) for step in parsed_steps],
+        "max_size": max_size or config.MAX_IMAGE_SIZE,
+        "format": fmt,
+        "quality": setting,
+        "render_quality": _check_render_quality(render_quality),
+    }
+    contents = await _read_upload(file, {})
+    try:
+        job = job_store.create(params, contents)
+    except JobStoreFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)}
+        )
+    job_runner.notify()
+    return JSONResponse(_job_view(job), status_code=202, headers={"Location": f"/jobs/{job['id']}"})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str = Path(..., description="Id returned by POST /jobs")):
+    """
+    Get the status of a job: queued, running (with its current stage), done or failed.
+
+    Args:
+        job_id (str): Id returned by ``POST /jobs``
+
+    Returns:
+        dict: The job, including ``progress`` (0.0 to 1.0) and ``result_url`` once done
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job expired or unknown")
+    return _job_view(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str = Path(..., description="Id returned by POST /jobs")):
+    """
+    Download the result of a finished job.
+
+    Args:
+        job_id (str): Id returned by ``POST /jobs``
+
+    Returns:
+        Response: The processed image; 409 while the job is queued or
+        running, or if it failed
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job expired or unknown")
+    if job["status"] == "failed":
+        raise HTTPException(status_code=409, detail=f"Job failed: {job['error']}")
+    if job["status"] != "done":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Job is {job['status']}",
+            headers={"Retry-After": str(config.RETRY_AFTER_SECONDS)}
+        )
+    data = job_store.result(job_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Job expired or unknown")
+    return Response(
+        content=data,
+        media_type=job["media_type"],
+        headers={
+            "Content-Disposition": f'inline; filename="{job_id}.{job["params"]["format"]}"',
+            "X-Output-Bytes": str(len(data))
+        }
+    )
+
+def _parse_scrub_request(text: str) -> dict:
+    """
+    Parse a ``{"style": ..., "intensity": ..., "id": ...}`` scrub message,
+    optionally with a ``render_quality`` tier.
+
+    Raises:
+        ValueError: If the message is malformed
+    """
+    message = json.loads(text)
+    if not isinstance(message, dict):
+        raise ValueError("Expected a JSON object")
+    intensity = float(message.get("intensity", 1.0))
+    if not 0.0 <= intensity <= 1.0:
+        raise ValueError("Intensity must be between 0.0 and 1.0")
+    render_quality = message.get("render_quality", "best")
+    if render_quality not in QUALITIES:
+        raise ValueError(f"Render quality must be one of: {', '.join(QUALITIES)}")
+    return {
+        "id": message.get("id"),
+        "style": str(message.get("style", "original")),
+        "intensity": quantize_intensity(intensity),
+        "render_quality": render_quality,
+    }
+
+@app.websocket("/ws/scrub")
+async def scrub(
+    websocket: WebSocket,
+    max_size: int = Query(None, ge=16, le=config.MAX_IMAGE_SIZE_LIMIT),
+    output_format: str = Query("jpeg", alias="format"),
+    quality: int = Query(None, ge=1, le=100)
+):
+    """
+    Stream re-rendered frames while the client scrubs style and intensity.
+
+    The client sends the image once as a binary message and is answered with
+    ``{"type": "ready", "width": ..., "height": ...}``. Each following text
+    message ``{"style": ..., "intensity": ..., "id": ...}`` is answered with a
+    ``{"type": "frame", ...}`` text message carrying the latency and stage
+    timings, followed by the encoded frame as a binary message. Sending
+    another binary message replaces the image.
+
+    The decoded image and the full-strength rendering of recent styles are
+    kept for the connection, so a new intensity only re-runs the blend and
+    the encode. Requests that arrive while a frame is being produced replace
+    one another; only the newest is rendered and the superseded ones are
+    counted in the next frame's ``dropped``.
+
+    Args:
+        websocket (WebSocket): The client connection
+        max_size (int): Longest side of the processed image, deployment default if omitted
+        output_format (str): Frame format: jpeg (default), png or webp
+        quality (int): JPEG/WebP quality, deployment default if omitted
+    """
+    await websocket.accept()
+    try:
+        fmt, setting = _negotiate_output(output_format, quality, None, None)
+    except HTTPException as e:
+        await websocket.close(code=1003, reason=e.detail)
+        return
+    max_size = max_size or config.MAX_IMAGE_SIZE
+
+    session = ScrubSession()
+    pending = {}  # Newest unprocessed "source" upload and "request"
+    wakeup = asyncio.Event()
+    dropped = 0
+
+    async def receive():
+        nonlocal dropped
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None:
+                    pending["source"] = message["bytes"]
+                else:
+                    try:
+                        request = _parse_scrub_request(message.get("text") or "")
+                    except ValueError as e:
+                        # Only the main loop sends, so nothing lands between a frame's two messages
+                        pending.setdefault("errors", []).append(str(e))
+                        wakeup.set()
+                        continue
+                    request["received"] = time.perf_counter()
+                    if "request" in pending:
+                        dropped += 1
+                    pending["request"] = request
+                wakeup.set()
+        finally:
+            pending["closed"] = True
+            wakeup.set()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            await wakeup.wait()
+            wakeup.clear()
+            if pending.get("closed"):
+                break
+            for detail in pending.pop("errors", ()):
+                await websocket.send_json({"type": "error", "detail": detail})
+
+            contents = pending.pop("source", None)
+            if contents is not None:
+                timings = {}
+                try:
+                    await run_in_threadpool(check_upload, contents)
+                    array = await _run_job(timings, decode_source, contents, max_size)
+                except ImageTooLarge as e:
+                    await websocket.send_json({"type": "error", "detail": str(e)})
+                    continue
+                except PoolSaturated as e:
+                    await websocket.send_json({"type": "error", "detail": str(e),
+                                               "retry_after": config.RETRY_AFTER_SECONDS})
+                    continue
+                except Exception as e:
+                    await websocket.send_json({"type": "error", "detail": f"Could not decode image: {e}"})
+                    continue
+                session.set_source(array)
+                await websocket.send_json({"type": "ready", "width": array.shape[1],
+                                           "height": array.shape[0], "stages": timings})
+
+            request = pending.pop("request", None)
+            if request is None:
+                continue
+            if session.source is None:
+                await websocket.send_json({"type": "error", "id": request["id"],
+                                           "detail": "Send the image as a binary message first"})
+                continue
+
+            style, intensity = request["style"], request["intensity"]
+            render_quality = request["render_quality"]
+            render_key = (style, render_quality)
+            timings = {}
+            try:
+                cached = session.has_render(render_key)
+                if cached:
+                    rendered = session.get_render(render_key)
+                elif not has_render_step(style):
+                    rendered = None
+                else:
+                    rendered = await _run_job(timings, render_source, session.source, style,
+                                              render_quality)
+                    session.put_render(render_key, rendered)
+                    # A newer request supersedes this one; the rendering is kept for it
+                    if "request" in pending:
+                        dropped += 1
+                        wakeup.set()
+                        continue
+                data = await _run_job(timings, render_frame, session.source, rendered,
+                                      style, intensity, fmt, setting, render_quality)
+            except PoolSaturated as e:
+                await websocket.send_json({"type": "error", "id": request["id"], "detail": str(e),
+                                           "retry_after": config.RETRY_AFTER_SECONDS})
+                continue
+            except Exception as e:
+                await websocket.send_json({"type": "error", "id": request["id"], "detail": str(e)})
+                continue
+
+            observe_stages("scrub", timings)
+            await websocket.send_json({
+                "type": "frame",
+                "id": request["id"],
+                "style": style,
+                "intensity": intensity,
+                "render_quality": render_quality,
+                "format": fmt,
+                "bytes": len(data),
+                "cached_render": cached,
+                "dropped": dropped,
+                "latency_ms": round((time.perf_counter() - request["received"]) * 1000, 2),
+                "stages": {name: round(duration, 2) for name, duration in timings.items()},
+            })
+            await websocket.send_bytes(data)
+            dropped = 0
+    except (WebSocketDisconnect, RuntimeError):
+        # The client went away while a frame was being sent
+        pass
+    finally:
+        receiver.cancel()
 
 @app.get("/")
 async def root():
@@ -107,6 +1284,7 @@ async def root():
             "email": "zain.dev00@gmail.com"
         },
         "documentation": "/docs",
+        "max_image_size": config.MAX_IMAGE_SIZE,
         "features": [
             "Multiple image processing styles",
             "Adjustable effect intensity",
@@ -117,4 +1295,6 @@ async def root():
     }
 
 if __name__ == "__main__":
+    # Only needed to serve locally; serverless platforms import ``app`` directly
+    import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,795 @@
+import copy
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Registered styles in display order, keyed by style name
+_STYLES = {}
+
+# Speed/quality tiers, cheapest first; "best" is the reference output
+QUALITIES = ("fast", "balanced", "best")
+
+
+class StyleFilter:
+    """
+    Base class for a registered image style.
+
+    Subclasses set ``name`` and ``description``, declare their tunable
+    ``params`` and build any constant kernels once in ``__init__`` so the
+    per-call ``apply`` only does the actual pixel work.
+    """
+
+    name = None
+    description = ""
+    params = {}
+    # True if swapping the B and R channels of the input swaps them in the output
+    channel_invariant = False
+    # True if each output pixel depends only on the input pixel at the same position
+    pointwise = False
+    # Parameter overrides that approximate the style more cheaply, per quality tier
+    quality_params = {}
+    # Peak temporary memory on top of the input and output, in image-sized
+    # 3-channel uint8 arrays; used to estimate what a request needs
+    working_set = 1.5
+
+    def apply(self, image: np.ndarray, intensity: float) -> np.ndarray:
+        """
+        Apply the style to a BGR uint8 image.
+
+        Args:
+            image (np.ndarray): Input image in BGR order
+            intensity (float): Intensity of the effect (0.0 to 1.0)
+
+        Returns:
+            np.ndarray: Processed BGR image
+        """
+        raise NotImplementedError
+
+    def apply_batch(self, frames: np.ndarray, intensities: np.ndarray, out: np.ndarray) -> np.ndarray:
+        """
+        Apply the style to every frame of an (N, H, W, 3) stack.
+
+        Point-wise styles run once per run of equal intensities, over those
+        frames stacked into one tall image; other styles run frame by frame.
+
+        Args:
+            frames (np.ndarray): C-contiguous (N, H, W, 3) uint8 stack in BGR order
+            intensities (np.ndarray): Intensity of each frame, shape (N,)
+            out (np.ndarray): C-contiguous buffer shaped like ``frames``; may be ``frames``
+
+        Returns:
+            np.ndarray: ``out``
+        """
+        if self.pointwise:
+            for start, stop, intensity in _intensity_runs(intensities):
+                self.apply_into(_stacked(frames[start:stop]), intensity, _stacked(out[start:stop]))
+        else:
+            for frame, intensity, target in zip(frames, intensities, out):
+                self.apply_into(frame, intensity, target)
+        return out
+
+    def apply_into(self, image: np.ndarray, intensity: float, out: np.ndarray) -> np.ndarray:
+        """
+        Apply the style, writing the result into ``out`` (which may be ``image``).
+
+        Styles whose final OpenCV call can take a destination override this
+        to skip the intermediate array.
+        """
+        out[...] = self.apply(image, intensity)
+        return out
+
+    def rgb_variant(self):
+        """
+        Return a filter that does the same work on RGB input, or None if the
+        input has to be converted to BGR first.
+        """
+        return self if self.channel_invariant else None
+
+    def for_channel_order(self, channel_order: str):
+        """Return the filter to run on ``channel_order`` input, or None if it must be converted."""
+        if channel_order == "BGR":
+            return self
+        if not hasattr(self, "_rgb_variant"):
+            self._rgb_variant = self.rgb_variant()
+        return self._rgb_variant
+
+    def for_quality(self, quality: str):
+        """
+        Return the filter to run at ``quality``, one of ``QUALITIES``.
+
+        Styles without cheaper tiers, and every style at "best", return
+        themselves; otherwise a copy with that tier's ``quality_params``.
+        """
+        if quality not in QUALITIES:
+            raise ValueError(f"Unknown quality: {quality}")
+        overrides = self.quality_params.get(quality)
+        if overrides is None:
+            return self
+        variants = self.__dict__.setdefault("_quality_variants", {})
+        if quality not in variants:
+            variant = copy.copy(self)
+            # Channel-order variants cached on this filter would run the "best" params
+            variant.__dict__.pop("_rgb_variant", None)
+            variant.__dict__.pop("_quality_variants", None)
+            variant.params = {**self.params, **overrides}
+            variants[quality] = variant
+        return variants[quality]
+
+    def halo(self, intensity: float):
+        """
+        Return how many pixels around a tile the style reads, or None if the
+        style depends on the whole image and cannot be processed in tiles.
+        """
+        return None
+
+    def apply_region(self, image: np.ndarray, intensity: float, origin: tuple, full_shape: tuple) -> np.ndarray:
+        """
+        Apply the style to a tile cut from a larger image.
+
+        Only position-dependent styles need to override this; everything
+        else behaves the same on a tile as on the whole image.
+
+        Args:
+            image (np.ndarray): Tile in BGR order, including its halo
+            intensity (float): Intensity of the effect (0.0 to 1.0)
+            origin (tuple): (row, col) of the tile's top-left pixel in the full image
+            full_shape (tuple): (rows, cols) of the full image
+
+        Returns:
+            np.ndarray: Processed tile
+        """
+        return self.apply(image, intensity)
+
+    @staticmethod
+    def blend(original: np.ndarray, processed: np.ndarray, intensity: float,
+              out: np.ndarray = None) -> np.ndarray:
+        """Mix the processed image back into the original by ``intensity``, into ``out`` if given."""
+        if out is not None:
+            return _blend_into(original, processed, intensity, out)
+        # addWeighted with weights 0/1 reproduces one input exactly, so skip the pass
+        if intensity >= 1:
+            return processed
+        if intensity <= 0:
+            return original.copy()
+        return cv2.addWeighted(original, 1 - intensity, processed, intensity, 0)
+
+
+def _stacked(frames: np.ndarray) -> np.ndarray:
+    """View a C-contiguous (N, H, W, C) stack as one (N * H, W, C) image."""
+    return frames.reshape(-1, *frames.shape[2:])
+
+
+def _intensity_runs(intensities):
+    """Yield (start, stop, intensity) for each run of equal consecutive intensities."""
+    start = 0
+    for index in range(1, len(intensities) + 1):
+        if index == len(intensities) or intensities[index] != intensities[start]:
+            yield start, index, float(intensities[start])
+            start = index
+
+
+def _blend_into(original: np.ndarray, processed: np.ndarray, intensity: float, out: np.ndarray) -> np.ndarray:
+    """``StyleFilter.blend`` writing into ``out``; any two of the arrays may be the same."""
+    if intensity <= 0:
+        if not np.may_share_memory(out, original):
+            out[...] = original
+    elif intensity < 1:
+        cv2.addWeighted(original, 1 - intensity, processed, intensity, 0, dst=out)
+    elif not np.may_share_memory(out, processed):
+        out[...] = processed
+    return out
+
+
+# Every possible uint8 value, used to evaluate per-channel point operations once
+_IDENTITY = np.arange(256, dtype=np.uint8).reshape(256, 1)
+
+
+class BlendFilter(StyleFilter):
+    """
+    Style that renders a full-strength effect and mixes it into the original.
+
+    ``render`` does all the intensity-independent work. A batch renders
+    each frame once into the output stack and then blends every run of
+    equal intensities with a single ``addWeighted`` over the stacked frames.
+    """
+
+    def render(self, image: np.ndarray) -> np.ndarray:
+        """Return the full-strength BGR rendering of ``image``."""
+        raise NotImplementedError
+
+    def apply(self, image, intensity):
+        return self.blend(image, self.render(image), intensity)
+
+    def apply_into(self, image, intensity, out):
+        return _blend_into(image, self.render(image) if intensity > 0 else None, intensity, out)
+
+    def apply_batch(self, frames, intensities, out):
+        if self.pointwise:
+            return super().apply_batch(frames, intensities, out)
+
+        # Render straight into ``out`` unless that would overwrite frames the blend still reads
+        rendered = np.empty_like(frames) if np.may_share_memory(out, frames) else out
+        for frame, intensity, target in zip(frames, intensities, rendered):
+            if intensity > 0:
+                target[...] = self.render(frame)
+
+        for start, stop, intensity in _intensity_runs(intensities):
+            _blend_into(_stacked(frames[start:stop]), _stacked(rendered[start:stop]),
+                        intensity, _stacked(out[start:stop]))
+        return out
+
+
+class LutFilter(StyleFilter):
+    """
+    Point-wise style whose channels are transformed independently.
+
+    ``channel_curves`` returns the full-strength output for every input
+    value of each BGR channel. The intensity blend is evaluated on those
+    256 values with the same ``addWeighted`` arithmetic as the per-pixel
+    path, so a single ``cv2.LUT`` pass gives bit-identical output.
+    """
+
+    pointwise = True
+
+    def halo(self, intensity):
+        return 0
+
+    def channel_curves(self):
+        """Return three (256, 1) uint8 curves for the B, G and R channels."""
+        raise NotImplementedError
+
+    def rgb_variant(self):
+        if self.channel_invariant:
+            return self
+        variant = copy.copy(self)
+        variant.channel_curves = lambda: self.channel_curves()[::-1]
+        return variant
+
+    @lru_cache(maxsize=128)
+    def lut(self, intensity: float) -> np.ndarray:
+        """Return the (256, 1, 3) lookup table with ``intensity`` folded in."""
+        table = np.empty((256, 1, 3), dtype=np.uint8)
+        for channel, curve in enumerate(self.channel_curves()):
+            table[:, :, channel] = self.blend(_IDENTITY, curve, intensity)
+        table.setflags(write=False)
+        return table
+
+    def apply(self, image, intensity):
+        return cv2.LUT(image, self.lut(intensity))
+
+    def apply_into(self, image, intensity, out):
+        return cv2.LUT(image, self.lut(intensity), dst=out)
+
+
+class ColorMatrixFilter(StyleFilter):
+    """
+    Point-wise style expressed as a linear mix of the BGR channels.
+
+    The intensity blend is folded into the matrix, ``(1 - t) * I + t * M``,
+    so the whole style is one ``cv2.transform`` pass. Rounding happens once
+    instead of twice, so results may differ from a render-then-blend by 1.
+    """
+
+    pointwise = True
+
+    def halo(self, intensity):
+        return 0
+
+    def full_matrix(self) -> np.ndarray:
+        """Return the 3x3 BGR matrix of the style at full strength."""
+        raise NotImplementedError
+
+    def rgb_variant(self):
+        variant = copy.copy(self)
+        # Reversing rows and columns turns a BGR -> BGR matrix into RGB -> RGB
+        variant.full_matrix = lambda: self.full_matrix()[::-1, ::-1]
+        return variant
+
+    @lru_cache(maxsize=128)
+    def matrix(self, intensity: float) -> np.ndarray:
+        """Return the 3x3 matrix with ``intensity`` folded in."""
+        matrix = (1 - intensity) * np.eye(3) + intensity * self.full_matrix()
+        matrix.setflags(write=False)
+        return matrix
+
+    def apply(self, image, intensity):
+        # At zero intensity the matrix is diagonal, which cv2.transform handles slowly
+        if intensity <= 0:
+            return image.copy()
+        return cv2.transform(image, self.matrix(intensity))
+
+    def apply_into(self, image, intensity, out):
+        if intensity <= 0:
+            return _blend_into(image, None, intensity, out)
+        return cv2.transform(image, self.matrix(intensity), dst=out)
+
+
+def register_style(cls):
+    """Class decorator that instantiates a StyleFilter and adds it to the registry."""
+    style = cls()
+    if not style.name:
+        raise ValueError(f"{cls.__name__} does not define a style name")
+    _STYLES[style.name] = style
+    return cls
+
+
+def get_style(name: str, quality: str = "best"):
+    """Return the registered filter for ``name`` at ``quality`` or None if it is unknown."""
+    style = _STYLES.get(name)
+    return style.for_quality(quality) if style is not None else None
+
+
+def style_names():
+    """Return the names of all registered styles in registration order."""
+    return list(_STYLES)
+
+
+def style_descriptions():
+    """Return a mapping of style name to description."""
+    return {name: style.description for name, style in _STYLES.items()}
+
+
+def _compose_luts(first: np.ndarray, second: np.ndarray) -> np.ndarray:
+    """Return the table equivalent to applying ``first`` and then ``second``."""
+    table = np.empty_like(first)
+    for channel in range(3):
+        table[:, 0, channel] = second[first[:, 0, channel], 0, channel]
+    return table
+
+
+def _preserves_range(matrix: np.ndarray) -> bool:
+    """True if the matrix maps [0, 255] pixels into [0, 255] without saturating."""
+    return bool(np.all(matrix >= 0) and np.all(matrix.sum(axis=1) <= 1 + 1e-9))
+
+
+def _via_bgr(style_filter, intensity):
+    """Stage that runs a BGR-only filter on RGB input by converting around it."""
+    def run(image):
+        processed = style_filter.apply(cv2.cvtColor(image, cv2.COLOR_RGB2BGR), intensity)
+        return cv2.cvtColor(processed, cv2.COLOR_BGR2RGB, dst=processed)
+    return run
+
+
+def compile_steps(steps, channel_order: str = "BGR", quality: str = "best"):
+    """
+    Turn ordered (style, intensity) steps into a list of image -> image stages.
+
+    Adjacent LUT styles are composed into one lookup table, which is exact.
+    Adjacent colour-matrix styles are multiplied into one matrix when the
+    earlier matrix cannot saturate, skipping an intermediate rounding. Either
+    way a fused run costs a single pass over the image. Unknown styles
+    (including "original") and blend styles at zero intensity are skipped;
+    every other step is applied exactly as ``process_array`` would.
+
+    Args:
+        steps (list): Ordered (style, intensity) pairs
+        channel_order (str): "BGR" or "RGB", the channel order of the images
+        quality (str): Speed/quality tier, one of ``QUALITIES``
+
+    Returns:
+        list: Callables taking and returning a uint8 image in ``channel_order``
+    """
+    stages = []
+    run = []  # Pending fusable steps: (style_filter, intensity)
+
+    def flush():
+        if len(run) == 1:
+            style_filter, intensity = run[0]
+            stages.append(lambda image: style_filter.apply(image, intensity))
+        elif run and isinstance(run[0][0], LutFilter):
+            table = run[0][0].lut(run[0][1])
+            for style_filter, intensity in run[1:]:
+                table = _compose_luts(table, style_filter.lut(intensity))
+            stages.append(lambda image: cv2.LUT(image, table))
+        elif run:
+            matrix = run[0][0].matrix(run[0][1])
+            for style_filter, intensity in run[1:]:
+                matrix = style_filter.matrix(intensity) @ matrix
+            stages.append(lambda image: cv2.transform(image, matrix))
+        run.clear()
+
+    for style, intensity in steps:
+        base_filter = get_style(style, quality)
+        # Blends at zero return the original, but other styles (sharpen,
+        # emboss, ...) still change the image, as in ``process_array``
+        if base_filter is None or (isinstance(base_filter, BlendFilter) and intensity <= 0):
+            continue
+
+        style_filter = base_filter.for_channel_order(channel_order)
+        if style_filter is None:
+            flush()
+            stages.append(_via_bgr(base_filter, intensity))
+            continue
+
+        if isinstance(style_filter, LutFilter):
+            if run and not isinstance(run[-1][0], LutFilter):
+                flush()
+        elif isinstance(style_filter, ColorMatrixFilter):
+            if run and not (isinstance(run[-1][0], ColorMatrixFilter)
+                            and _preserves_range(run[-1][0].matrix(run[-1][1]))):
+                flush()
+        else:
+            flush()
+            stages.append(lambda image, f=style_filter, t=intensity: f.apply(image, t))
+            continue
+        run.append((style_filter, intensity))
+
+    flush()
+    return stages
+
+
+@lru_cache(maxsize=16)
+def _vignette_axes(rows: int, cols: int) -> tuple:
+    """Build (once per image size) the separable factors of the vintage vignette."""
+    sigma = VintageFilter.params["vignette_sigma"]
+    kernel_y = cv2.getGaussianKernel(rows, sigma)
+    kernel_x = cv2.getGaussianKernel(cols, sigma)
+    # The norm of an outer product is the product of the factors' norms
+    axis_y = 255 * kernel_y / np.linalg.norm(kernel_y)
+    axis_x = (kernel_x / np.linalg.norm(kernel_x)).T
+    axis_y.setflags(write=False)
+    axis_x.setflags(write=False)
+    return axis_y, axis_x
+
+
+# Pixels per band of the vintage vignette, whose mask and product are float64
+_VIGNETTE_BAND_PIXELS = 1 << 16
+
+
+def _vignette_region(rows: int, cols: int, top: int, left: int, height: int, width: int) -> np.ndarray:
+    """Return the vignette mask for one region of a ``rows`` x ``cols`` image."""
+    axis_y, axis_x = _vignette_axes(rows, cols)
+    mask = axis_y[top:top + height] * axis_x[:, left:left + width]
+    return mask[:, :, np.newaxis]
+
+
+@register_style
+class GrayscaleFilter(ColorMatrixFilter):
+    name = "grayscale"
+    description = "Convert image to black and white"
+
+    def __init__(self):
+        # BT.601 luma weights in BGR order, as used by COLOR_BGR2GRAY
+        self.luma = np.tile([0.114, 0.587, 0.299], (3, 1))
+
+    def full_matrix(self):
+        return self.luma
+
+
+@register_style
+class SepiaFilter(BlendFilter):
+    name = "sepia"
+    description = "Add a warm, vintage brown tone"
+    pointwise = True
+
+    def __init__(self):
+        self.kernel = np.array([[0.272, 0.534, 0.131],
+                                [0.349, 0.686, 0.168],
+                                [0.393, 0.769, 0.189]])
+
+    def halo(self, intensity):
+        return 0
+
+    def render(self, image):
+        # Not folded into one matrix: the sepia rows sum above 1, so the full-strength
+        # result must saturate at 255 before blending to match the reference output
+        return cv2.transform(image, self.kernel)
+
+    def rgb_variant(self):
+        variant = copy.copy(self)
+        variant.kernel = np.ascontiguousarray(self.kernel[::-1, ::-1])
+        return variant
+
+
+@register_style
+class BlurFilter(StyleFilter):
+    name = "blur"
+    description = "Apply Gaussian blur effect"
+    channel_invariant = True
+    params = {"max_kernel_size": 15}
+
+    def kernel_size(self, intensity):
+        return int(self.params["max_kernel_size"] * intensity) | 1  # Ensure odd number
+
+    def halo(self, intensity):
+        return self.kernel_size(intensity) // 2
+
+    def apply(self, image, intensity):
+        kernel_size = self.kernel_size(intensity)
+        return cv2.GaussianBlur(image, (kernel_size, kernel_size), 0)
+
+    def apply_into(self, image, intensity, out):
+        kernel_size = self.kernel_size(intensity)
+        return cv2.GaussianBlur(image, (kernel_size, kernel_size), 0, dst=out)
+
+
+@register_style
+class EdgeDetectionFilter(BlendFilter):
+    name = "edge_detection"
+    description = "Highlight edges in the image"
+    params = {"low_threshold": 100, "high_threshold": 200}
+    working_set = 4.0
+
+    # No halo: Canny's hysteresis follows edges across the whole image.
+    # Not channel invariant either: on colour input Canny breaks gradient
+    # ties between channels by their order.
+
+    def render(self, image):
+        edges = cv2.Canny(image, self.params["low_threshold"], self.params["high_threshold"])
+        return cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
+
+
+@register_style
+class SharpenFilter(StyleFilter):
+    name = "sharpen"
+    description = "Enhance image details and edges"
+    channel_invariant = True
+
+    def __init__(self):
+        self.kernel = np.array([[-1, -1, -1],
+                                [-1,  9, -1],
+                                [-1, -1, -1]], dtype=np.float64)
+
+    def halo(self, intensity):
+        return 1
+
+    def apply(self, image, intensity):
+        return cv2.filter2D(image, -1, self.kernel * intensity)
+
+    def apply_into(self, image, intensity, out):
+        return cv2.filter2D(image, -1, self.kernel * intensity, dst=out)
+
+
+@register_style
+class VintageFilter(BlendFilter):
+    name = "vintage"
+    description = "Apply a retro filter with warm tones"
+    channel_invariant = True
+    params = {"alpha": 1.1, "beta": 10, "vignette_sigma": 200}
+    # The float64 mask and product only exist one band of rows at a time
+    working_set = 1.5
+
+    def halo(self, intensity):
+        return 0
+
+    def render(self, image):
+        return self._vignette(image, image.shape[:2], (0, 0))
+
+    def apply_region(self, image, intensity, origin, full_shape):
+        # The vignette depends on where the tile sits in the full image
+        return self.blend(image, self._vignette(image, full_shape, origin), intensity)
+
+    def _vignette(self, image, full_shape, origin):
+        processed = cv2.convertScaleAbs(image, alpha=self.params["alpha"], beta=self.params["beta"])
+        height, width = image.shape[:2]
+        band = max(1, _VIGNETTE_BAND_PIXELS // width)
+        for start in range(0, height, band):
+            rows = slice(start, min(start + band, height))
+            mask = _vignette_region(*full_shape, origin[0] + start, origin[1],
+                                    rows.stop - start, width)
+            # Truncating cast, matching assignment of the float product into uint8
+            processed[rows] = processed[rows] * mask
+        return processed
+
+
+@register_style
+class CoolToneFilter(LutFilter):
+    name = "cool_tone"
+    description = "Enhance blue tones for a cool effect"
+    params = {"alpha": 1.2, "beta": 10}
+
+    def channel_curves(self):
+        boosted = cv2.convertScaleAbs(_IDENTITY, alpha=self.params["alpha"], beta=self.params["beta"])
+        return boosted, _IDENTITY, _IDENTITY
+
+
+@register_style
+class WarmToneFilter(LutFilter):
+    name = "warm_tone"
+    description = "Enhance red tones for a warm effect"
+    params = {"alpha": 1.2, "beta": 10}
+
+    def channel_curves(self):
+        boosted = cv2.convertScaleAbs(_IDENTITY, alpha=self.params["alpha"], beta=self.params["beta"])
+        return _IDENTITY, _IDENTITY, boosted
+
+
+@register_style
+class PencilSketchFilter(BlendFilter):
+    name = "pencil_sketch"
+    description = "Convert image to pencil sketch style"
+    params = {"blur_kernel_size": 21}
+    working_set = 2.5
+
+    def halo(self, intensity):
+        return self.params["blur_kernel_size"] // 2
+
+    def render(self, image):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        inv = 255 - gray
+        size = self.params["blur_kernel_size"]
+        blur = cv2.GaussianBlur(inv, (size, size), 0)
+        sketch = cv2.divide(gray, 255 - blur, scale=256.0)
+        return cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
+
+
+def _box(image: np.ndarray, radius: int) -> np.ndarray:
+    return cv2.boxFilter(image, -1, (2 * radius + 1, 2 * radius + 1))
+
+
+def _guided_upsample(guide: np.ndarray, small_guide: np.ndarray, small_result: np.ndarray,
+                     radius: int = 2, eps: float = 1e-3) -> np.ndarray:
+    """
+    Upsample a low-resolution filter result to the size of ``guide``.
+
+    Fits the result as a local linear function of the low-resolution guide
+    (as in a guided filter), then applies the upsampled coefficients to the
+    full-resolution guide, so edges and fine detail come from ``guide``.
+    All inputs are float32 single-channel images.
+    """
+    mean_guide, mean_result = _box(small_guide, radius), _box(small_result, radius)
+    covariance = _box(small_guide * small_result, radius) - mean_guide * mean_result
+    variance = _box(small_guide * small_guide, radius) - mean_guide * mean_guide
+    slope = covariance / (variance + eps)
+    offset = mean_result - slope * mean_guide
+    size = guide.shape[1::-1]
+    slope = cv2.resize(_box(slope, radius), size, interpolation=cv2.INTER_LINEAR)
+    offset = cv2.resize(_box(offset, radius), size, interpolation=cv2.INTER_LINEAR)
+    return slope * guide + offset
+
+
+def _detail_enhance_scaled(image: np.ndarray, sigma_s: float, sigma_r: float, scale: float) -> np.ndarray:
+    """
+    Approximate ``cv2.detailEnhance`` by smoothing at reduced resolution.
+
+    detailEnhance splits the Lab lightness into an edge-aware smoothed base
+    and the detail on top of it, then triples the detail. Only the base is
+    computed on a downscaled copy and brought back with guided upsampling;
+    the detail still comes from the full-resolution lightness.
+    """
+    lab = cv2.cvtColor(image.astype(np.float32) * (1 / 255), cv2.COLOR_BGR2Lab)
+    lightness = lab[:, :, 0] * (1 / 100)
+    small = cv2.resize(lightness, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    # edgePreservingFilter only takes 8-bit colour, and sums the edge strength
+    # of the three identical channels, hence the tripled range sigma
+    small_bgr = cv2.cvtColor(np.clip(small * 255 + 0.5, 0, 255).astype(np.uint8), cv2.COLOR_GRAY2BGR)
+    base = cv2.edgePreservingFilter(small_bgr, flags=cv2.RECURS_FILTER, sigma_s=sigma_s * scale,
+                                    sigma_r=min(1.0, sigma_r * 3))
+    base = base[:, :, 0].astype(np.float32) * (1 / 255)
+
+    base = _guided_upsample(lightness, small, base)
+    lab[:, :, 0] = (3 * lightness - 2 * base) * 100
+    result = cv2.cvtColor(lab, cv2.COLOR_Lab2BGR)
+    return np.clip(result * 255 + 0.5, 0, 255).astype(np.uint8)
+
+
+@register_style
+class HdrEffectFilter(BlendFilter):
+    name = "hdr_effect"
+    description = "Enhance local contrast for HDR-like effect"
+    params = {"sigma_s": 12, "sigma_r": 0.15, "scale": 1.0}
+    quality_params = {
+        "fast": {"scale": 0.25},
+        "balanced": {"scale": 0.5},
+    }
+
+    # No halo: detailEnhance's recursive edge-aware filter reaches across the image
+
+    @property
+    def working_set(self):
+        # Both paths work on float32 Lab copies of the image
+        return 31.0 if self.params["scale"] >= 1 else 22.0
+
+    def render(self, image):
+        p = self.params
+        if p["scale"] >= 1:
+            return cv2.detailEnhance(image, sigma_s=p["sigma_s"], sigma_r=p["sigma_r"])
+        return _detail_enhance_scaled(image, p["sigma_s"], p["sigma_r"], p["scale"])
+
+
+@register_style
+class CartoonFilter(BlendFilter):
+    name = "cartoon"
+    description = "Transform image into cartoon style"
+    params = {"median_size": 5, "block_size": 9, "c": 9,
+              "diameter": 9, "sigma_color": 300, "sigma_space": 300, "scale": 1.0}
+    working_set = 3.5
+    # With sigma_color this large the bilateral is close to a plain blur, so a
+    # smaller one at reduced resolution and a linear upsample look the same
+    quality_params = {
+        "fast": {"scale": 0.5, "diameter": 5, "sigma_space": 150},
+        "balanced": {"scale": 0.75, "diameter": 7, "sigma_space": 225},
+    }
+
+    def halo(self, intensity):
+        p = self.params
+        if p["scale"] < 1:
+            # Resampling a tile does not match resampling the whole image
+            return None
+        # Edges come from a threshold over a median-filtered image, so those radii add up
+        return max(p["median_size"] // 2 + p["block_size"] // 2, p["diameter"] // 2)
+
+    def render(self, image):
+        p = self.params
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        gray = cv2.medianBlur(gray, p["median_size"])
+        edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY,
+                                      p["block_size"], p["c"])
+        if p["scale"] < 1:
+            small = cv2.resize(image, None, fx=p["scale"], fy=p["scale"], interpolation=cv2.INTER_AREA)
+            color = cv2.bilateralFilter(small, p["diameter"], p["sigma_color"], p["sigma_space"])
+            color = cv2.resize(color, image.shape[1::-1], interpolation=cv2.INTER_LINEAR)
+        else:
+            color = cv2.bilateralFilter(image, p["diameter"], p["sigma_color"], p["sigma_space"])
+        return cv2.bitwise_and(color, color, mask=edges)
+
+
+@register_style
+class InvertFilter(LutFilter):
+    name = "invert"
+    description = "Invert image colors"
+    channel_invariant = True
+
+    def channel_curves(self):
+        inverted = cv2.bitwise_not(_IDENTITY)
+        return inverted, inverted, inverted
+
+    def apply(self, image, intensity):
+        # The blend (1 - t) * x + t * (255 - x) is linear, so one scaled pass does it
+        # all; convertScaleAbs is much faster than a LUT and stays within 1 of it
+        return cv2.convertScaleAbs(image, alpha=1 - 2 * intensity, beta=255 * intensity)
+
+    def apply_into(self, image, intensity, out):
+        return cv2.convertScaleAbs(image, dst=out, alpha=1 - 2 * intensity, beta=255 * intensity)
+
+
+@register_style
+class EmbossFilter(StyleFilter):
+    name = "emboss"
+    description = "Create an embossed effect"
+    channel_invariant = True
+    params = {"offset": 128}
+
+    def __init__(self):
+        self.kernel = np.array([[-2, -1, 0],
+                                [-1,  1, 1],
+                                [ 0,  1, 2]], dtype=np.float64)
+
+    def halo(self, intensity):
+        return 1
+
+    def apply(self, image, intensity):
+        # uint8 addition wraps around, which is what gives emboss its look
+        return cv2.filter2D(image, -1, self.kernel * intensity) + np.uint8(self.params["offset"])
+
+    def apply_into(self, image, intensity, out):
+        cv2.filter2D(image, -1, self.kernel * intensity, dst=out)
+        return np.add(out, np.uint8(self.params["offset"]), out=out)
+
+
+@register_style
+class WatercolorFilter(BlendFilter):
+    name = "watercolor"
+    description = "Create a watercolor painting effect"
+    channel_invariant = True
+    params = {"diameter": 9, "sigma_color": 75, "sigma_space": 75, "median_size": 5,
+              "iterations": 1}
+    working_set = 3.0
+    # Repeated small bilaterals smooth about as far as one large one, at a fraction of the cost
+    quality_params = {
+        "fast": {"diameter": 3, "iterations": 2},
+        "balanced": {"diameter": 5, "iterations": 2},
+    }
+
+    def halo(self, intensity):
+        p = self.params
+        return p["iterations"] * (p["diameter"] // 2) + p["median_size"] // 2
+
+    def render(self, image):
+        p = self.params
+        bilateral = image
+        for _ in range(p["iterations"]):
+            bilateral = cv2.bilateralFilter(bilateral, p["diameter"], p["sigma_color"], p["sigma_space"])
+        return cv2.medianBlur(bilateral, p["median_size"])
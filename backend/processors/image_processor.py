@@ -1,23 +1,375 @@
+import threading
+
 import cv2
 import numpy as np
 from PIL import Image
-import io
+from processors.filters import (
+    BlendFilter, StyleFilter, get_style, style_names, style_descriptions, compile_steps
+)
+from processors.render_cache import RenderCache, image_digest
+from processors.tiling import process_tiled
+from processors.timing import stage
+
+# PIL modes that map directly onto uint8 arrays the processor understands
+_ARRAY_MODES = ("RGB", "RGBA", "L", "LA")
+
+# Result buffer each worker thread reuses across ``scratch`` renders
+_scratch = threading.local()
+
+
+def _packed(out: np.ndarray) -> bool:
+    """
+    True if OpenCV can write a 3-channel result into ``out`` in place: that
+    works for row-strided views such as contact sheet cells, but not for
+    channel slices.
+    """
+    return out.dtype == np.uint8 and out.ndim == 3 and out.strides[1:] == (3, 1)
 
 class ImageProcessor:
+    # Full-strength renderings of blend-based styles, shared across intensities;
+    # the service layer swaps in one sized from its configuration
+    render_cache = RenderCache(max_bytes=64 * 1024 * 1024)
+
+    @staticmethod
+    def _to_array_mode(pil_image):
+        """Convert palette, CMYK, 16-bit and other PIL modes to RGB(A)."""
+        if pil_image.mode in _ARRAY_MODES:
+            return pil_image
+        has_alpha = "A" in pil_image.mode or "transparency" in pil_image.info
+        return pil_image.convert("RGBA" if has_alpha else "RGB")
+
+    @staticmethod
+    def to_array(pil_image) -> np.ndarray:
+        """View a PIL image as the RGB, RGBA, L or LA uint8 array ``process_array`` takes."""
+        return np.asarray(ImageProcessor._to_array_mode(pil_image))
+
+    @staticmethod
+    def _split_channels(array: np.ndarray):
+        """
+        Split an image array into its colour part and its alpha channel.
+
+        Returns:
+            tuple: (H, W, 3) colour image (a view where possible) and the
+            (H, W) alpha channel, or None if the image has no alpha
+        """
+        if array.dtype != np.uint8:
+            raise ValueError(f"Expected a uint8 image, got {array.dtype}")
+        if array.ndim == 2:
+            return cv2.cvtColor(array, cv2.COLOR_GRAY2BGR), None
+
+        channels = array.shape[2] if array.ndim == 3 else 0
+        if channels == 1:
+            return cv2.cvtColor(array, cv2.COLOR_GRAY2BGR), None
+        if channels == 2:
+            return cv2.cvtColor(array[:, :, 0], cv2.COLOR_GRAY2BGR), array[:, :, 1]
+        if channels == 3:
+            return array, None
+        if channels == 4:
+            return array[:, :, :3], array[:, :, 3]
+        raise ValueError(f"Unsupported image shape {array.shape}")
+
     @staticmethod
-    def _pil_to_cv2(pil_image):
-        """Convert PIL Image to CV2 format."""
-        numpy_image = np.array(pil_image)
-        return cv2.cvtColor(numpy_image, cv2.COLOR_RGB2BGR)
+    def _scratch_buffer(array: np.ndarray) -> np.ndarray:
+        """Return the calling thread's reusable result buffer, shaped for ``array``."""
+        channels = 4 if array.ndim == 3 and array.shape[2] in (2, 4) else 3
+        shape = array.shape[:2] + (channels,)
+        size = shape[0] * shape[1] * channels
+        buffer = getattr(_scratch, "buffer", None)
+        # Grow for larger images, and let go of a large buffer once sizes drop well below it
+        if buffer is None or not size <= buffer.size <= 4 * size:
+            buffer = _scratch.buffer = np.empty(size, dtype=np.uint8)
+        return buffer[:size].reshape(shape)
 
     @staticmethod
-    def _cv2_to_pil(cv2_image):
-        """Convert CV2 image to PIL format."""
-        color_converted = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2RGB)
-        return Image.fromarray(color_converted)
+    def _merge_channels(processed: np.ndarray, alpha, out: np.ndarray = None) -> np.ndarray:
+        """Combine processed colour channels with the untouched alpha channel."""
+        if alpha is None and out is None:
+            return processed
+
+        rows, cols = processed.shape[:2]
+        channels = 3 if alpha is None else 4
+        if out is None:
+            out = np.empty((rows, cols, channels), dtype=np.uint8)
+        elif out.shape != (rows, cols, channels) or out.dtype != np.uint8:
+            raise ValueError(f"Output buffer must be uint8 with shape {(rows, cols, channels)}")
+
+        color_out = out[:, :, :3]
+        if not np.shares_memory(color_out, processed):
+            color_out[...] = processed
+        if alpha is not None and not np.shares_memory(out[:, :, 3], alpha):
+            out[:, :, 3] = alpha
+        return out
 
     @staticmethod
-    def process_image(image: Image.Image, style: str, intensity: float = 1.0) -> Image.Image:
+    def process_array(array: np.ndarray, style: str, intensity: float = 1.0,
+                      channel_order: str = "BGR", out: np.ndarray = None,
+                      tile_size: int = None, quality: str = "best",
+                      cache: bool = True) -> np.ndarray:
+        """
+        Apply the selected style to a uint8 array without any PIL round trip.
+
+        Grayscale (H, W), colour (H, W, 3) and colour plus alpha (H, W, 4)
+        arrays are accepted. The style runs on the colour channels and alpha
+        is passed through untouched. Most styles run directly on RGB input
+        (channel-symmetric ones as-is, LUT and matrix styles with permuted
+        tables); the rest convert to BGR and back.
+
+        Args:
+            array (np.ndarray): Input image
+            style (str): Style to apply
+            intensity (float): Intensity of the effect (0.0 to 1.0)
+            channel_order (str): "BGR" or "RGB", order of the colour channels
+            out (np.ndarray): Optional buffer for the result; may be ``array``
+                itself to process in place
+            tile_size (int): If set, images larger than this are processed in
+                parallel tiles; the output is identical to the untiled path
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+            cache (bool): Use ``render_cache`` for blend-based styles, see
+                ``render_style``
+
+        Returns:
+            np.ndarray: Processed image in ``channel_order``, with 4 channels
+            if the input had alpha and 3 otherwise
+        """
+        if channel_order not in ("BGR", "RGB"):
+            raise ValueError(f"Unknown channel order: {channel_order}")
+
+        color, alpha = ImageProcessor._split_channels(array)
+
+        # Unknown styles (including "original") leave the image untouched
+        base_filter = get_style(style, quality)
+        if base_filter is None:
+            return ImageProcessor._merge_channels(color, alpha, out)
+
+        # Expensive blend-based styles render once per image and blend per intensity
+        if isinstance(base_filter, BlendFilter) and not base_filter.pointwise:
+            rendered = None
+            if intensity > 0:
+                rendered = ImageProcessor.render_style(array, style, channel_order, tile_size, quality,
+                                                       cache)
+            return ImageProcessor.blend_rendered(array, rendered, intensity, out)
+
+        style_filter = base_filter.for_channel_order(channel_order)
+        convert = style_filter is None
+        if convert:
+            color = cv2.cvtColor(color, cv2.COLOR_RGB2BGR)
+            style_filter = base_filter
+
+        if tile_size:
+            # Tiles write straight into ``out`` unless it aliases the input,
+            # where a tile could read pixels a neighbour already overwrote
+            direct = (out is not None and alpha is None and not convert
+                      and _packed(out) and not np.may_share_memory(out, array))
+            processed = process_tiled(color, style_filter, intensity, tile_size,
+                                      out=out if direct else None)
+        else:
+            processed = style_filter.apply(color, intensity)
+
+        # Ensure output is in valid range
+        if processed.dtype != np.uint8:
+            processed = np.clip(processed, 0, 255).astype(np.uint8)
+
+        if convert:
+            processed = cv2.cvtColor(processed, cv2.COLOR_BGR2RGB, dst=processed)
+
+        return ImageProcessor._merge_channels(processed, alpha, out)
+
+    @staticmethod
+    def render_style(array: np.ndarray, style: str, channel_order: str = "BGR",
+                     tile_size: int = None, quality: str = "best", cache: bool = True):
+        """
+        Return the full-strength, un-blended rendering of a blend-based style.
+
+        Styles such as hdr_effect, cartoon or watercolor do all their
+        expensive work independently of the intensity and then mix the result
+        into the original. Keeping this rendering lets ``blend_rendered``
+        produce any intensity with a single ``addWeighted``. Renderings of
+        all but the cheap point-wise styles are kept in ``render_cache``,
+        keyed by a digest of the pixels, the style, the channel order and the
+        quality tier.
+
+        Args:
+            array (np.ndarray): Input image, as accepted by ``process_array``
+            style (str): Style to render
+            channel_order (str): "BGR" or "RGB", order of the colour channels
+            tile_size (int): If set, large images are rendered in parallel tiles
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+            cache (bool): Look up and keep the rendering in ``render_cache``;
+                off for animation frames, which would only push other entries out
+
+        Returns:
+            np.ndarray: Read-only (H, W, 3) rendering in ``channel_order`` if it
+            came from the cache, or None if the style does not separate
+            rendering from blending
+        """
+        base_filter = get_style(style, quality)
+        if not isinstance(base_filter, BlendFilter):
+            return None
+
+        render_cache = ImageProcessor.render_cache
+        key = None
+        if cache and render_cache.enabled and not base_filter.pointwise:
+            key = (image_digest(array), style, channel_order, quality)
+            rendered = render_cache.get(key)
+            if rendered is not None:
+                return rendered
+
+        color, _ = ImageProcessor._split_channels(array)
+        style_filter = base_filter.for_channel_order(channel_order)
+        convert = style_filter is None
+        if convert:
+            color = cv2.cvtColor(color, cv2.COLOR_RGB2BGR)
+            style_filter = base_filter
+
+        if tile_size:
+            # At full intensity the blend is skipped, leaving just the rendering
+            rendered = process_tiled(color, style_filter, 1.0, tile_size)
+        else:
+            rendered = style_filter.render(color)
+        if convert:
+            rendered = cv2.cvtColor(rendered, cv2.COLOR_BGR2RGB, dst=rendered)
+
+        if key is not None:
+            render_cache.put(key, rendered)
+        return rendered
+
+    @staticmethod
+    def blend_rendered(array: np.ndarray, rendered: np.ndarray, intensity: float,
+                       out: np.ndarray = None) -> np.ndarray:
+        """
+        Mix a ``render_style`` result into the image at ``intensity``.
+
+        The result equals ``process_array`` with the same style and intensity;
+        alpha is passed through untouched. ``rendered`` is never modified.
+
+        Args:
+            array (np.ndarray): Input image the rendering was made from
+            rendered (np.ndarray): Output of ``render_style`` for ``array``
+            intensity (float): Intensity of the effect (0.0 to 1.0)
+            out (np.ndarray): Optional buffer for the result
+
+        Returns:
+            np.ndarray: Processed image in the channel order of ``array``
+        """
+        color, alpha = ImageProcessor._split_channels(array)
+        if alpha is None and out is not None and out.shape == color.shape and _packed(out):
+            # Blend straight into the buffer instead of through a temporary
+            return StyleFilter.blend(color, rendered, intensity, out)
+        blended = StyleFilter.blend(color, rendered, intensity)
+        if blended is rendered and alpha is None and out is None:
+            blended = rendered.copy()
+        return ImageProcessor._merge_channels(blended, alpha, out)
+
+    @staticmethod
+    def sweep_array(array: np.ndarray, style: str, intensities, channel_order: str = "BGR",
+                    out=None, tile_size: int = None, quality: str = "best") -> list:
+        """
+        Apply one style to the same image at several intensities.
+
+        Blend-based styles are rendered once at full strength and each
+        intensity is a single ``addWeighted`` blend of that rendering; other
+        styles (whose kernels depend on the intensity) run once per
+        intensity. Every result equals ``process_array`` with that intensity.
+
+        Args:
+            array (np.ndarray): Input image, as accepted by ``process_array``
+            style (str): Style to apply
+            intensities (sequence): Intensities to render (0.0 to 1.0)
+            channel_order (str): "BGR" or "RGB", order of the colour channels
+            out (sequence): Optional buffers, one per intensity, e.g. the cells
+                of a contact sheet
+            tile_size (int): If set, large images are processed in parallel tiles
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+
+        Returns:
+            list: One processed image per intensity, in ``channel_order``
+        """
+        outputs = list(out) if out is not None else [None] * len(intensities)
+        if len(outputs) != len(intensities):
+            raise ValueError(f"Expected {len(intensities)} output buffers, got {len(outputs)}")
+
+        if not isinstance(get_style(style, quality), BlendFilter):
+            return [
+                ImageProcessor.process_array(array, style, intensity, channel_order, buffer,
+                                             tile_size, quality)
+                for intensity, buffer in zip(intensities, outputs)
+            ]
+
+        rendered = None
+        if any(intensity > 0 for intensity in intensities):
+            rendered = ImageProcessor.render_style(array, style, channel_order, tile_size, quality)
+        return [
+            ImageProcessor.blend_rendered(array, rendered, intensity, buffer)
+            for intensity, buffer in zip(intensities, outputs)
+        ]
+
+    @staticmethod
+    def process_batch(frames: np.ndarray, style: str, intensities=1.0,
+                      channel_order: str = "BGR", out: np.ndarray = None,
+                      quality: str = "best") -> np.ndarray:
+        """
+        Apply one style to a stack of same-sized frames.
+
+        Point-wise styles and intensity blends run as single operations over
+        each run of equal intensities, with the frames stacked into one tall
+        image; spatial styles run frame by frame, writing straight into the
+        output stack. Every frame gets the same result as ``process_array``.
+
+        Args:
+            frames (np.ndarray): (N, H, W, 3) uint8 stack
+            style (str): Style to apply
+            intensities (float or sequence): Intensity of each frame (0.0 to 1.0),
+                or one intensity for all of them
+            channel_order (str): "BGR" or "RGB", order of the colour channels
+            out (np.ndarray): Optional C-contiguous buffer shaped like ``frames``;
+                may be ``frames`` itself to process in place
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+
+        Returns:
+            np.ndarray: Processed (N, H, W, 3) stack in ``channel_order``
+        """
+        if channel_order not in ("BGR", "RGB"):
+            raise ValueError(f"Unknown channel order: {channel_order}")
+        if frames.dtype != np.uint8 or frames.ndim != 4 or frames.shape[3] != 3:
+            raise ValueError(f"Expected a uint8 (N, H, W, 3) stack, got {frames.dtype} {frames.shape}")
+        intensities = np.broadcast_to(np.asarray(intensities, dtype=np.float64), frames.shape[:1])
+
+        if out is None:
+            out = np.empty(frames.shape, dtype=np.uint8)
+        elif out.shape != frames.shape or out.dtype != np.uint8 or not out.flags.c_contiguous:
+            raise ValueError(f"Output buffer must be C-contiguous uint8 with shape {frames.shape}")
+        frames = np.ascontiguousarray(frames)
+        cols = frames.shape[2]
+
+        # Unknown styles (including "original") leave the frames untouched
+        base_filter = get_style(style, quality)
+        if base_filter is None:
+            if not np.may_share_memory(out, frames):
+                out[...] = frames
+            return out
+
+        style_filter = base_filter.for_channel_order(channel_order)
+        convert = style_filter is None
+        if convert:
+            # One conversion over the whole stack rather than one per frame
+            frames = cv2.cvtColor(frames.reshape(-1, cols, 3), cv2.COLOR_RGB2BGR).reshape(frames.shape)
+            style_filter = base_filter
+
+        style_filter.apply_batch(frames, intensities, out)
+
+        if convert:
+            stacked = out.reshape(-1, cols, 3)
+            cv2.cvtColor(stacked, cv2.COLOR_BGR2RGB, dst=stacked)
+        return out
+
+    @staticmethod
+    def process_image(image: Image.Image, style: str, intensity: float = 1.0,
+                      tile_size: int = None, quality: str = "best",
+                      scratch: bool = False) -> Image.Image:
         """
         Apply the selected style to the input image.
 
@@ -25,146 +377,86 @@ class ImageProcessor:
             image (PIL.Image): Input image
             style (str): Style to apply
             intensity (float): Intensity of the effect (0.0 to 1.0)
+            tile_size (int): If set, images larger than this are processed in
+                parallel tiles; the output is identical to the untiled path
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+            scratch (bool): Write the result into a buffer owned by the calling
+                thread and reused by its next ``scratch`` call instead of a new
+                array; the returned image is only valid until then
 
         Returns:
             PIL.Image: Processed image
         """
-        # Convert PIL image to CV2 format
-        cv2_image = ImageProcessor._pil_to_cv2(image)
+        # View the PIL image as an RGB(A) array; no colour conversion needed
+        with stage("to_cv2"):
+            array = ImageProcessor.to_array(image)
 
-        if style == "grayscale":
-            gray = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2GRAY)
-            processed = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
+        with stage("style"):
+            out = None
+            if scratch and get_style(style) is not None:
+                out = ImageProcessor._scratch_buffer(array)
+            processed = ImageProcessor.process_array(
+                array, style, intensity, channel_order="RGB", out=out, tile_size=tile_size,
+                quality=quality
+            )
 
-        elif style == "sepia":
-            kernel = np.array([[0.272, 0.534, 0.131],
-                             [0.349, 0.686, 0.168],
-                             [0.393, 0.769, 0.189]])
-            processed = cv2.transform(cv2_image, kernel)
-            processed = np.clip(processed, 0, 255).astype(np.uint8)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "blur":
-            kernel_size = int(15 * intensity) | 1  # Ensure odd number
-            processed = cv2.GaussianBlur(cv2_image, (kernel_size, kernel_size), 0)
-
-        elif style == "edge_detection":
-            edges = cv2.Canny(cv2_image, 100, 200)
-            edges = cv2.cvtColor(edges, cv2.COLOR_GRAY2BGR)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, edges, intensity, 0)
-
-        elif style == "sharpen":
-            kernel = np.array([[-1,-1,-1],
-                             [-1, 9,-1],
-                             [-1,-1,-1]]) * intensity
-            processed = cv2.filter2D(cv2_image, -1, kernel)
-
-        elif style == "vintage":
-            processed = cv2.convertScaleAbs(cv2_image, alpha=1.1, beta=10)
-            rows, cols = processed.shape[:2]
-            kernel_x = cv2.getGaussianKernel(cols, 200)
-            kernel_y = cv2.getGaussianKernel(rows, 200)
-            kernel = kernel_y * kernel_x.T
-            mask = 255 * kernel / np.linalg.norm(kernel)
-            for i in range(3):
-                processed[:,:,i] = processed[:,:,i] * mask
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "cool_tone":
-            b, g, r = cv2.split(cv2_image)
-            b = cv2.convertScaleAbs(b, alpha=1.2, beta=10)
-            processed = cv2.merge([b, g, r])
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "warm_tone":
-            b, g, r = cv2.split(cv2_image)
-            r = cv2.convertScaleAbs(r, alpha=1.2, beta=10)
-            processed = cv2.merge([b, g, r])
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "pencil_sketch":
-            gray = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2GRAY)
-            inv = 255 - gray
-            blur = cv2.GaussianBlur(inv, (21, 21), 0)
-            sketch = cv2.divide(gray, 255 - blur, scale=256.0)
-            processed = cv2.cvtColor(sketch, cv2.COLOR_GRAY2BGR)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "hdr_effect":
-            hdr = cv2.detailEnhance(cv2_image, sigma_s=12, sigma_r=0.15)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, hdr, intensity, 0)
-
-        elif style == "cartoon":
-            # Cartoon effect
-            gray = cv2.cvtColor(cv2_image, cv2.COLOR_BGR2GRAY)
-            gray = cv2.medianBlur(gray, 5)
-            edges = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, 9, 9)
-            color = cv2.bilateralFilter(cv2_image, 9, 300, 300)
-            cartoon = cv2.bitwise_and(color, color, mask=edges)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, cartoon, intensity, 0)
-
-        elif style == "invert":
-            processed = cv2.bitwise_not(cv2_image)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, processed, intensity, 0)
-
-        elif style == "emboss":
-            kernel = np.array([[-2,-1,0],
-                             [-1, 1,1],
-                             [ 0, 1,2]]) * intensity
-            processed = cv2.filter2D(cv2_image, -1, kernel) + 128
-
-        elif style == "watercolor":
-            # Simulate watercolor effect
-            bilateral = cv2.bilateralFilter(cv2_image, 9, 75, 75)
-            median = cv2.medianBlur(bilateral, 5)
-            processed = cv2.addWeighted(cv2_image, 1 - intensity, median, intensity, 0)
+        # fromarray goes through Image.frombuffer; 4-channel results are
+        # wrapped without a copy, 3-channel ones are padded to PIL's RGBX
+        with stage("to_pil"):
+            return Image.fromarray(processed)
 
-        else:
-            processed = cv2_image
+    @staticmethod
+    def process_pipeline(image: Image.Image, steps, quality: str = "best") -> Image.Image:
+        """
+        Apply several styles in order on a single in-memory array.
 
-        # Ensure output is in valid range
-        processed = np.clip(processed, 0, 255).astype(np.uint8)
+        Adjacent point-wise steps are fused into a single pass where possible.
 
-        # Convert back to PIL format
-        return ImageProcessor._cv2_to_pil(processed)
+        Args:
+            image (PIL.Image): Input image
+            steps (list): Ordered (style, intensity) pairs
+            quality (str): Speed/quality tier of the expensive styles: "fast",
+                "balanced" or "best" (the reference output)
+
+        Returns:
+            PIL.Image: Processed image
+        """
+        with stage("to_cv2"):
+            array = ImageProcessor.to_array(image)
+
+        with stage("style"):
+            processed = ImageProcessor.pipeline_array(array, steps, "RGB", quality)
+
+        with stage("to_pil"):
+            return Image.fromarray(processed)
+
+    @staticmethod
+    def pipeline_array(array: np.ndarray, steps, channel_order: str = "BGR",
+                       quality: str = "best") -> np.ndarray:
+        """
+        Apply several styles in order to a uint8 array, as ``process_pipeline`` does.
+
+        Args:
+            array (np.ndarray): Input image, as accepted by ``process_array``
+            steps (list): Ordered (style, intensity) pairs
+            channel_order (str): "BGR" or "RGB", order of the colour channels
+            quality (str): Speed/quality tier of the expensive styles
+
+        Returns:
+            np.ndarray: Processed image in ``channel_order``
+        """
+        processed, alpha = ImageProcessor._split_channels(array)
+        for step in compile_steps(steps, channel_order=channel_order, quality=quality):
+            processed = step(processed)
+        return ImageProcessor._merge_channels(processed, alpha)
 
     @staticmethod
     def get_available_styles():
         """Return a list of available image processing styles."""
-        return [
-            "grayscale",
-            "sepia",
-            "blur",
-            "edge_detection",
-            "sharpen",
-            "vintage",
-            "cool_tone",
-            "warm_tone",
-            "pencil_sketch",
-            "hdr_effect",
-            "cartoon",
-            "invert",
-            "emboss",
-            "watercolor"
-        ]
+        return style_names()
 
     @staticmethod
     def get_style_descriptions():
         """Return descriptions for each available style."""
-        return {
-            "grayscale": "Convert image to black and white",
-            "sepia": "Add a warm, vintage brown tone",
-            "blur": "Apply Gaussian blur effect",
-            "edge_detection": "Highlight edges in the image",
-            "sharpen": "Enhance image details and edges",
-            "vintage": "Apply a retro filter with warm tones",
-            "cool_tone": "Enhance blue tones for a cool effect",
-            "warm_tone": "Enhance red tones for a warm effect",
-            "pencil_sketch": "Convert image to pencil sketch style",
-            "hdr_effect": "Enhance local contrast for HDR-like effect",
-            "cartoon": "Transform image into cartoon style",
-            "invert": "Invert image colors",
-            "emboss": "Create an embossed effect",
-            "watercolor": "Create a watercolor painting effect"
-        }
+        return style_descriptions()
@@ -0,0 +1,75 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def image_digest(array: np.ndarray) -> str:
+    """Return a hex digest identifying the pixels, shape and dtype of ``array``."""
+    digest = hashlib.sha256(np.ascontiguousarray(array).data)
+    digest.update(f"{array.shape}|{array.dtype}".encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    LRU cache of full-strength style renderings.
+
+    Entries are keyed on the digest of the source pixels together with the
+    style and channel order, held up to ``max_bytes`` and marked read-only
+    so that every blend can share them. A ``max_bytes`` of 0 disables the
+    cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: tuple):
+        """Return the rendering stored under ``key`` or None on a miss."""
+        with self._lock:
+            rendered = self._entries.get(key)
+            if rendered is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rendered
+
+    def put(self, key: tuple, rendered: np.ndarray):
+        """Store ``rendered`` under ``key``, evicting the least recently used entries."""
+        rendered.setflags(write=False)
+        with self._lock:
+            # Entries larger than the whole budget would evict everything else
+            if rendered.nbytes > self.max_bytes:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.nbytes
+            self._entries[key] = rendered
+            self._size += rendered.nbytes
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.nbytes
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and memory usage."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+            }
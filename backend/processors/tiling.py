@@ -0,0 +1,140 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Shared pool for tile and frame work; OpenCV releases the GIL, so threads scale with cores
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int = None) -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers or os.cpu_count() or 1,
+                thread_name_prefix="zainvision-tile"
+            )
+        return _executor
+
+
+def set_pool_size(workers: int):
+    """
+    Create the shared pool with ``workers`` threads, before anything uses it.
+
+    Processes that already run one per core, such as the bulk tool's
+    workers, call this with 1 so their tiles and frames do not multiply the
+    threads on every core.
+
+    Raises:
+        RuntimeError: If the shared pool has already been created
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            raise RuntimeError("The shared tile pool is already running")
+        _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zainvision-tile")
+
+
+def tile_regions(shape: tuple, tile_size: int):
+    """
+    Yield the (top, bottom, left, right) bounds of each tile covering ``shape``.
+
+    Args:
+        shape (tuple): (rows, cols) of the image
+        tile_size (int): Width and height of a tile, before its halo is added
+    """
+    rows, cols = shape[:2]
+    for top in range(0, rows, tile_size):
+        for left in range(0, cols, tile_size):
+            yield top, min(top + tile_size, rows), left, min(left + tile_size, cols)
+
+
+def process_tiled(image: np.ndarray, style_filter, intensity: float, tile_size: int,
+                  out: np.ndarray = None, workers: int = None) -> np.ndarray:
+    """
+    Apply a style tile by tile on a thread pool, writing into one output buffer.
+
+    Each tile is cut with a halo as wide as the style's kernel radius, so
+    every kept pixel sees exactly the neighbourhood it would see in the
+    whole image and the result is pixel-identical to the untiled path.
+    Styles that need the whole image (``halo`` returns None) and images no
+    larger than one tile are processed in a single call.
+
+    Args:
+        image (np.ndarray): Input image in BGR order
+        style_filter (StyleFilter): Registered style to apply
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        tile_size (int): Width and height of a tile, before its halo is added
+        out (np.ndarray): Optional preallocated output buffer, same shape as ``image``
+        workers (int): Size of the shared tile pool, used when it is first created
+
+    Returns:
+        np.ndarray: Processed image (``out`` if it was given)
+    """
+    halo = style_filter.halo(intensity)
+    rows, cols = image.shape[:2]
+    if halo is None or (rows <= tile_size and cols <= tile_size):
+        if out is None:
+            return style_filter.apply(image, intensity)
+        return style_filter.apply_into(image, intensity, out)
+
+    if out is None:
+        out = np.empty_like(image)
+
+    def run_tile(region):
+        top, bottom, left, right = region
+        # Views into the source; the halo is clipped at the image border, where
+        # the tile and the full image share the same border handling
+        pad_top, pad_left = max(0, top - halo), max(0, left - halo)
+        pad_bottom, pad_right = min(rows, bottom + halo), min(cols, right + halo)
+        tile = image[pad_top:pad_bottom, pad_left:pad_right]
+
+        processed = style_filter.apply_region(tile, intensity, (pad_top, pad_left), (rows, cols))
+        out[top:bottom, left:right] = processed[top - pad_top:bottom - pad_top,
+                                                left - pad_left:right - pad_left]
+
+    # list() surfaces any exception raised inside a tile
+    list(_get_executor(workers).map(run_tile, tile_regions(image.shape, tile_size)))
+    return out
+
+
+def map_ordered(fn, items, lookahead: int, same=None, workers: int = None):
+    """
+    Yield ``fn(item)`` for every item, in order, computing ahead on the shared pool.
+
+    ``items`` may be a generator: it is only advanced while fewer than
+    ``lookahead`` results are pending, so memory stays proportional to the
+    lookahead however many items there are. ``fn`` must not wait on the
+    shared pool itself (no tiling), or the pool could deadlock.
+
+    Args:
+        fn (callable): Function applied to each item
+        items (iterable): Items to process
+        lookahead (int): Most results computed or held ahead of the consumer
+        same (callable): Optional ``same(previous, item)`` test; when it is
+            true the previous item's result is reused instead of calling ``fn``
+        workers (int): Size of the shared pool, used when it is first created
+    """
+    executor = _get_executor(workers)
+    pending = deque()
+    previous = future = None
+    try:
+        for item in items:
+            if future is None or same is None or not same(previous, item):
+                future = executor.submit(fn, item)
+            pending.append(future)
+            previous = item
+            if len(pending) >= max(1, lookahead):
+                yield pending.popleft().result()
+        # Let go of the last item before draining
+        previous = None
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # The consumer stopped early, e.g. a client disconnected
+        for future in pending:
+            future.cancel()
@@ -0,0 +1,49 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Recorder of the request currently being processed on this thread, if any
+_local = threading.local()
+
+
+class StageTimer:
+    """Accumulates wall-clock milliseconds per named processing stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def record_stages():
+    """
+    Collect the stages timed on this thread into a new StageTimer.
+
+    Code deeper in the call stack (such as ``ImageProcessor``) times itself
+    with ``stage`` without needing the timer passed in explicitly.
+    """
+    previous = getattr(_local, "timer", None)
+    timer = _local.timer = StageTimer()
+    try:
+        yield timer
+    finally:
+        _local.timer = previous
+
+
+@contextmanager
+def stage(name: str):
+    """Time a block as ``name`` if a recorder is active on this thread."""
+    timer = getattr(_local, "timer", None)
+    if timer is None:
+        yield
+        return
+    with timer.stage(name):
+        yield
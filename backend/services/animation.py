@@ -0,0 +1,260 @@
+import os
+from collections import deque
+from functools import partial
+from itertools import islice
+
+import cv2
+import numpy as np
+from PIL import GifImagePlugin, Image, ImageSequence
+
+import config
+from processors.filters import get_style
+from processors.image_processor import ImageProcessor
+from processors.tiling import map_ordered
+from services.rendering import _fit_size, open_image
+
+# Frames are styled on the shared tile pool rather than the worker pool, so
+# nothing here has to be picklable.
+
+# Delay, in milliseconds, of GIF frames that do not specify one
+_DEFAULT_DURATION = 100
+
+# Written for video files whose frame rate cannot be read
+_DEFAULT_FPS = 25.0
+
+# Codec of video outputs; MPEG-4 Part 2 ships with every OpenCV build
+_VIDEO_FOURCC = "mp4v"
+
+
+def _target_size(size: tuple, max_size: int) -> tuple:
+    return size if max(size) <= max_size else _fit_size(size, max_size)
+
+
+def style_frame(array: np.ndarray, size: tuple, steps: tuple, channel_order: str = "RGB",
+                render_quality: str = "best") -> np.ndarray:
+    """
+    Resize one frame to ``size`` and apply ``steps`` to it.
+
+    Frames are never tiled: they run side by side on the shared pool, which
+    tiling would wait on. They also skip the render cache; repeated frames
+    are caught by ``map_ordered`` instead.
+
+    Args:
+        array (np.ndarray): Frame in ``channel_order``, with or without alpha
+        size (tuple): (width, height) of the output
+        steps (tuple): Ordered (style, intensity) pairs
+        channel_order (str): "BGR" or "RGB", order of the colour channels
+        render_quality (str): Speed/quality tier of the expensive styles
+
+    Returns:
+        np.ndarray: The styled frame
+    """
+    if (array.shape[1], array.shape[0]) != tuple(size):
+        array = cv2.resize(array, tuple(size), interpolation=cv2.INTER_AREA)
+    if len(steps) == 1:
+        style, intensity = steps[0]
+        return ImageProcessor.process_array(array, style, intensity, channel_order,
+                                            quality=render_quality, cache=False)
+    return ImageProcessor.pipeline_array(array, steps, channel_order, render_quality)
+
+
+def iter_image_frames(image: Image.Image, max_frames: int = None):
+    """
+    Yield (RGB(A) array, duration in ms) for each frame of an image, lazily.
+
+    Frames come out composited onto the full canvas, as they are displayed.
+    They are RGBA if the first frame has transparency and RGB otherwise.
+    A still image yields a single frame.
+    """
+    mode = "RGBA" if "A" in image.mode or "transparency" in image.info else "RGB"
+    for frame in islice(ImageSequence.Iterator(image), max_frames):
+        yield np.asarray(frame.convert(mode)), frame.info.get("duration") or _DEFAULT_DURATION
+
+
+def gif_frame(array: np.ndarray) -> Image.Image:
+    """
+    Quantize an RGB(A) frame to a palette image for GIF encoding.
+
+    Pixels less than half opaque become palette index 255, which is
+    reserved for transparency.
+    """
+    # Median cut is about 20x slower and the frames change too quickly to tell
+    image = Image.fromarray(np.ascontiguousarray(array[:, :, :3])).quantize(
+        255, method=Image.Quantize.FASTOCTREE
+    )
+    palette = image.getpalette()
+    image.putpalette(palette + [0] * (768 - len(palette)))
+    if array.shape[2] == 4:
+        mask = Image.fromarray(array[:, :, 3]).point(lambda alpha: 255 if alpha < 128 else 0)
+        image.paste(255, mask=mask)
+        image.info["transparency"] = 255
+    return image
+
+
+def encode_gif(frames, loop: int = 0):
+    """
+    Encode (palette image, duration in ms) frames as a GIF, one frame at a time.
+
+    Each frame carries its own colour table, so a frame can be written as
+    soon as it is ready and nothing but the current frame is held.
+
+    Args:
+        frames (iterable): Frames from ``gif_frame`` with their durations
+        loop (int): Number of times to play, 0 for forever
+
+    Yields:
+        bytes: The GIF header, every frame and the trailer
+    """
+    started = False
+    for image, duration in frames:
+        params = {"duration": duration, "include_color_table": True}
+        if "transparency" in image.info:
+            # Frames are composited already, so each replaces the previous one
+            params.update(transparency=image.info["transparency"], disposal=2)
+        if not started:
+            header, _ = GifImagePlugin.getheader(image, info={"loop": loop})
+            yield b"".join(header)
+            started = True
+        yield b"".join(GifImagePlugin.getdata(image, **params))
+    if started:
+        yield b";"
+
+
+def count_frames(contents: bytes) -> int:
+    """
+    Return the number of frames of an uploaded image without decoding them.
+
+    Raises:
+        ValueError: If the upload is not a readable image
+    """
+    try:
+        image = open_image(contents)
+    except Exception as e:
+        raise ValueError(f"Cannot read image: {e}")
+    return getattr(image, "n_frames", 1)
+
+
+def animation_peak(contents: bytes, steps: tuple, max_size: int, lookahead: int,
+                   render_quality: str = "best", workers: int = None) -> int:
+    """
+    Estimate the peak memory of streaming an animation through ``render_animation``.
+
+    Up to ``lookahead`` source frames and results are held at once, and up
+    to ``workers`` (the shared pool's size) frames are being styled with
+    the styles' temporaries.
+
+    Returns:
+        int: Estimated bytes, or 0 if the upload is not a readable image
+    """
+    try:
+        image = open_image(contents)
+    except Exception:
+        # Decoding fails straight away, so there is nothing to reserve
+        return 0
+    # PIL composites every frame onto an RGBA canvas of the full size
+    canvas = image.width * image.height * 4
+    out_width, out_height = _target_size(image.size, max_size)
+    frame = out_width * out_height * 4
+    styles = [get_style(style, render_quality) for style, _ in steps]
+    working_set = max((style.working_set for style in styles if style is not None), default=0.0)
+    running = min(lookahead, workers or os.cpu_count() or 1)
+    return int(canvas + lookahead * (canvas + frame) + running * frame * working_set)
+
+
+def render_animation(contents: bytes, steps: tuple, max_size: int = config.MAX_IMAGE_SIZE,
+                     render_quality: str = "best", lookahead: int = config.ANIMATION_LOOKAHEAD,
+                     max_frames: int = config.MAX_ANIMATION_FRAMES):
+    """
+    Style every frame of an uploaded image and stream the result as a GIF.
+
+    Frames are decoded lazily, styled ``lookahead`` at a time on the shared
+    pool and encoded in order as they finish, so memory depends on the
+    lookahead rather than on the number of frames. A frame identical to the
+    one before it reuses its result.
+
+    Args:
+        contents (bytes): Raw bytes of an animated GIF, WebP or PNG (or a still image)
+        steps (tuple): Ordered (style, intensity) pairs
+        max_size (int): Maximum width or height of the frames
+        render_quality (str): Speed/quality tier of the expensive styles
+        lookahead (int): Most frames styled or held ahead of the encoder
+        max_frames (int): Frames after this many are dropped
+
+    Yields:
+        bytes: Consecutive chunks of the GIF
+    """
+    image = open_image(contents)
+    size = _target_size(image.size, max_size)
+    durations = deque()
+
+    def arrays():
+        for array, duration in iter_image_frames(image, max_frames):
+            durations.append(duration)
+            yield array
+
+    def render(array):
+        return gif_frame(style_frame(array, size, steps, "RGB", render_quality))
+
+    frames = map_ordered(render, arrays(), lookahead, same=np.array_equal)
+    yield from encode_gif((frame, durations.popleft()) for frame in frames)
+
+
+def iter_video_frames(capture, max_frames: int = None):
+    """Yield the BGR frames of an open ``cv2.VideoCapture`` until it runs out."""
+    count = 0
+    while max_frames is None or count < max_frames:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        count += 1
+        yield frame
+
+
+def render_video(source: str, target: str, steps: tuple, max_size: int = config.MAX_IMAGE_SIZE,
+                 render_quality: str = "best", lookahead: int = config.ANIMATION_LOOKAHEAD) -> int:
+    """
+    Style every frame of a local video file and write an MPEG-4 video.
+
+    Frames are read, styled and written like ``render_animation``: at most
+    ``lookahead`` of them are held at once and repeated frames are styled
+    once. The frame rate is kept; audio is dropped.
+
+    Args:
+        source (str): Input video path, in any format OpenCV can read
+        target (str): Output path, ending in ``.mp4``
+        steps (tuple): Ordered (style, intensity) pairs
+        max_size (int): Maximum width or height of the frames
+        render_quality (str): Speed/quality tier of the expensive styles
+        lookahead (int): Most frames styled or held ahead of the writer
+
+    Returns:
+        int: Number of frames written
+
+    Raises:
+        ValueError: If the input cannot be read or the output cannot be written
+    """
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Cannot read video {source}")
+    writer = None
+    try:
+        width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        size = _target_size((width, height), max_size)
+        fps = capture.get(cv2.CAP_PROP_FPS) or _DEFAULT_FPS
+        writer = cv2.VideoWriter(target, cv2.VideoWriter_fourcc(*_VIDEO_FOURCC), fps, size)
+        if not writer.isOpened():
+            raise ValueError(f"Cannot write video {target}")
+
+        render = partial(style_frame, size=size, steps=steps, channel_order="BGR",
+                         render_quality=render_quality)
+        count = 0
+        for frame in map_ordered(render, iter_video_frames(capture), lookahead,
+                                 same=np.array_equal):
+            writer.write(frame)
+            count += 1
+        return count
+    finally:
+        capture.release()
+        if writer is not None:
+            writer.release()
@@ -0,0 +1,37 @@
+import io
+import zipfile
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only sink that hands back whatever was written since the last drain."""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+async def stream_zip(entries):
+    """
+    Build a zip archive incrementally from an async iterator of (name, bytes).
+
+    Each entry is yielded as soon as it is written, so the client starts
+    receiving data before the slowest entry is ready. Entries are stored
+    uncompressed because they are already compressed images.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, data in entries:
+            archive.writestr(name, data)
+            yield buffer.drain()
+    yield buffer.drain()
@@ -0,0 +1,355 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+# Jobs in these states hold a result or an error and can expire
+FINISHED = ("done", "failed")
+
+
+class JobStoreFull(Exception):
+    """Raised when a job's upload or result does not fit in the store's byte budget."""
+
+
+def _new_job(params: dict, now: float) -> dict:
+    return {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "progress": 0.0,
+        "stage": None,
+        "params": params,
+        "created_at": now,
+        "started_at": None,
+        "finished_at": None,
+        "expires_at": None,
+        "error": None,
+        "media_type": None,
+        "result_bytes": None,
+        "stages": None,
+    }
+
+
+class MemoryJobStore:
+    """
+    In-process queue and result store for asynchronous jobs.
+
+    Queued jobs keep their upload until they run; finished jobs keep their
+    result (or error) for ``ttl`` seconds. Uploads and results together are
+    held to ``max_bytes`` by evicting the oldest finished jobs first; when
+    only queued and running jobs are left, new jobs are refused with
+    ``JobStoreFull``. Everything is lost on restart.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, clock=time.time):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._jobs = {}  # id -> job dict
+        self._payloads = {}  # id -> upload bytes while queued, result bytes once done
+        self._queue = deque()
+        self._finished = OrderedDict()  # ids of finished jobs, oldest first
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def create(self, params: dict, contents: bytes) -> dict:
+        """
+        Queue a new job for ``contents``.
+
+        Args:
+            params (dict): JSON-serializable processing parameters
+            contents (bytes): Raw bytes of the uploaded file
+
+        Returns:
+            dict: The new job
+
+        Raises:
+            JobStoreFull: If the upload does not fit in the byte budget
+        """
+        with self._lock:
+            self._expire()
+            self._make_room(len(contents))
+            job = _new_job(params, self._clock())
+            self._jobs[job["id"]] = job
+            self._payloads[job["id"]] = contents
+            self._size += len(contents)
+            self._queue.append(job["id"])
+            return dict(job)
+
+    def claim(self):
+        """
+        Mark the oldest queued job as running.
+
+        Returns:
+            tuple: The job and its upload, or None if nothing is queued
+        """
+        with self._lock:
+            if not self._queue:
+                return None
+            job_id = self._queue.popleft()
+            job = self._jobs[job_id]
+            job.update(status="running", started_at=self._clock())
+            return dict(job), self._payloads[job_id]
+
+    def update(self, job_id: str, **fields):
+        """Record the progress or current stage of a running job."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(fields)
+
+    def finish(self, job_id: str, result: bytes, media_type: str, stages: dict = None):
+        """
+        Store the result of a job, replacing its upload.
+
+        A result that does not fit in the byte budget fails the job instead.
+        """
+        with self._lock:
+            self._release(job_id)
+            try:
+                self._make_room(len(result))
+            except JobStoreFull as e:
+                self._finish(job_id, status="failed", error=str(e))
+                return
+            self._payloads[job_id] = result
+            self._size += len(result)
+            self._finish(job_id, status="done", progress=1.0, media_type=media_type,
+                         result_bytes=len(result), stages=stages)
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed with ``error``, dropping its upload."""
+        with self._lock:
+            self._release(job_id)
+            self._finish(job_id, status="failed", error=error)
+
+    def get(self, job_id: str):
+        """Return the job ``job_id`` or None if it is unknown or expired."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def result(self, job_id: str):
+        """Return the result bytes of a finished job, or None."""
+        with self._lock:
+            self._expire()
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != "done":
+                return None
+            return self._payloads[job_id]
+
+    def requeue_running(self):
+        """Nothing survives a restart in memory, so there is nothing to requeue."""
+
+    def stats(self) -> dict:
+        """Return job counts by status and memory usage."""
+        with self._lock:
+            self._expire()
+            counts = dict.fromkeys(("queued", "running") + FINISHED, 0)
+            for job in self._jobs.values():
+                counts[job["status"]] += 1
+            return {"jobs": counts, "bytes": self._size, "max_bytes": self.max_bytes,
+                    "ttl_seconds": self.ttl}
+
+    def _release(self, job_id):
+        payload = self._payloads.pop(job_id, None)
+        if payload is not None:
+            self._size -= len(payload)
+
+    def _finish(self, job_id, **fields):
+        now = self._clock()
+        self._jobs[job_id].update(finished_at=now, expires_at=now + self.ttl, **fields)
+        self._finished[job_id] = None
+
+    def _drop(self, job_id):
+        self._release(job_id)
+        del self._jobs[job_id]
+        del self._finished[job_id]
+
+    def _expire(self):
+        # Every job gets the same TTL, so finished jobs expire in finishing order
+        now = self._clock()
+        while self._finished:
+            job_id = next(iter(self._finished))
+            if self._jobs[job_id]["expires_at"] > now:
+                break
+            self._drop(job_id)
+
+    def _make_room(self, size: int):
+        if size > self.max_bytes:
+            raise JobStoreFull(f"{size} bytes exceed the job store budget of {self.max_bytes}")
+        while self._size + size > self.max_bytes and self._finished:
+            self._drop(next(iter(self._finished)))
+        if self._size + size > self.max_bytes:
+            raise JobStoreFull("Job store is full, try again later")
+
+
+class SqliteJobStore:
+    """
+    Job queue and result store kept in a SQLite database file.
+
+    Behaves like ``MemoryJobStore`` but survives restarts: jobs that were
+    running when the server stopped are queued again on startup, and
+    finished results stay available until they expire.
+    """
+
+    _COLUMNS = ("id", "status", "progress", "stage", "params", "created_at", "started_at",
+                "finished_at", "expires_at", "error", "media_type", "result_bytes", "stages")
+
+    def __init__(self, path: str, max_bytes: int, ttl: float, clock=time.time):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        # Shared by the event loop and worker threads, serialized by the lock
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL,"
+            " status TEXT NOT NULL, progress REAL NOT NULL, stage TEXT, params TEXT NOT NULL,"
+            " created_at REAL NOT NULL, started_at REAL, finished_at REAL, expires_at REAL,"
+            " error TEXT, media_type TEXT, result_bytes INTEGER, stages TEXT,"
+            " payload BLOB, size INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, seq)")
+
+    def _row(self, row) -> dict:
+        job = dict(zip(self._COLUMNS, row))
+        job["params"] = json.loads(job["params"])
+        job["stages"] = json.loads(job["stages"]) if job["stages"] else None
+        return job
+
+    def _size(self) -> int:
+        return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM jobs").fetchone()[0]
+
+    def _expire(self):
+        self._db.execute("DELETE FROM jobs WHERE expires_at <= ?", (self._clock(),))
+
+    def _make_room(self, size: int):
+        if size > self.max_bytes:
+            raise JobStoreFull(f"{size} bytes exceed the job store budget of {self.max_bytes}")
+        total = self._size()
+        finished = self._db.execute(
+            "SELECT id, size FROM jobs WHERE status IN (?, ?) ORDER BY finished_at", FINISHED
+        ).fetchall()
+        for job_id, job_size in finished:
+            if total + size <= self.max_bytes:
+                break
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+            total -= job_size
+        if total + size > self.max_bytes:
+            raise JobStoreFull("Job store is full, try again later")
+
+    def create(self, params: dict, contents: bytes) -> dict:
+        """Queue a new job for ``contents``; see ``MemoryJobStore.create``."""
+        with self._lock:
+            self._expire()
+            self._make_room(len(contents))
+            job = _new_job(params, self._clock())
+            self._db.execute(
+                "INSERT INTO jobs (id, status, progress, params, created_at, payload, size)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job["id"], job["status"], job["progress"], json.dumps(params), job["created_at"],
+                 contents, len(contents))
+            )
+            return job
+
+    def claim(self):
+        """Mark the oldest queued job as running; see ``MemoryJobStore.claim``."""
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(self._COLUMNS)}, payload FROM jobs"
+                " WHERE status = 'queued' ORDER BY seq LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._row(row[:-1])
+            job.update(status="running", started_at=self._clock())
+            self._db.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                             (job["status"], job["started_at"], job["id"]))
+            return job, row[-1]
+
+    def update(self, job_id: str, **fields):
+        """Record the progress or current stage of a running job."""
+        columns = [name for name in fields if name in self._COLUMNS]
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in columns)} WHERE id = ?",
+                [fields[name] for name in columns] + [job_id]
+            )
+
+    def finish(self, job_id: str, result: bytes, media_type: str, stages: dict = None):
+        """Store the result of a job; see ``MemoryJobStore.finish``."""
+        with self._lock:
+            now = self._clock()
+            self._db.execute("UPDATE jobs SET payload = NULL, size = 0 WHERE id = ?", (job_id,))
+            try:
+                self._make_room(len(result))
+            except JobStoreFull as e:
+                self._db.execute(
+                    "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, expires_at = ?"
+                    " WHERE id = ?", (str(e), now, now + self.ttl, job_id)
+                )
+                return
+            self._db.execute(
+                "UPDATE jobs SET status = 'done', progress = 1.0, media_type = ?, result_bytes = ?,"
+                " stages = ?, payload = ?, size = ?, finished_at = ?, expires_at = ? WHERE id = ?",
+                (media_type, len(result), json.dumps(stages) if stages else None, result,
+                 len(result), now, now + self.ttl, job_id)
+            )
+
+    def fail(self, job_id: str, error: str):
+        """Mark a job as failed with ``error``, dropping its upload."""
+        with self._lock:
+            now = self._clock()
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, payload = NULL, size = 0,"
+                " finished_at = ?, expires_at = ? WHERE id = ?",
+                (error, now, now + self.ttl, job_id)
+            )
+
+    def get(self, job_id: str):
+        """Return the job ``job_id`` or None if it is unknown or expired."""
+        with self._lock:
+            self._expire()
+            row = self._db.execute(
+                f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            return self._row(row) if row is not None else None
+
+    def result(self, job_id: str):
+        """Return the result bytes of a finished job, or None."""
+        with self._lock:
+            self._expire()
+            row = self._db.execute(
+                "SELECT payload FROM jobs WHERE id = ? AND status = 'done'", (job_id,)
+            ).fetchone()
+            return row[0] if row is not None else None
+
+    def requeue_running(self):
+        """Queue again the jobs that were running when the server stopped."""
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = 'queued', progress = 0, stage = NULL, started_at = NULL"
+                " WHERE status = 'running'"
+            )
+
+    def stats(self) -> dict:
+        """Return job counts by status and storage usage."""
+        with self._lock:
+            self._expire()
+            counts = dict.fromkeys(("queued", "running") + FINISHED, 0)
+            for status, count in self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status"):
+                counts[status] = count
+            return {"jobs": counts, "bytes": self._size(), "max_bytes": self.max_bytes,
+                    "ttl_seconds": self.ttl}
+
+
+def make_job_store(db_path: str, max_bytes: int, ttl: float):
+    """Return a SQLite-backed store at ``db_path``, or an in-memory one if it is empty."""
+    if db_path:
+        return SqliteJobStore(db_path, max_bytes, ttl)
+    return MemoryJobStore(max_bytes, ttl)
@@ -0,0 +1,148 @@
+import asyncio
+
+import config
+from processors.image_processor import ImageProcessor
+from processors.timing import record_stages, stage
+from services.metrics import observe_stages
+from services.rendering import (
+    OUTPUT_FORMATS, encode_image, estimate_peak, load_image, style_frames
+)
+from services.worker_pool import PoolSaturated
+
+# The parts below run on the worker pool, so they must stay picklable
+# module-level functions for the process pool mode.
+
+
+def decode_part(contents: bytes, max_size: int):
+    """Decode and resize a job's upload."""
+    with record_stages() as timer:
+        image = load_image(contents, max_size)
+    return image, timer.stages
+
+
+def style_part(image, steps: list, render_quality: str = "best"):
+    """
+    Apply a job's steps.
+
+    A single step runs like ``/process-image`` (tiled for large images) and
+    several steps like ``/process-pipeline``, so results match the
+    synchronous endpoints.
+    """
+    with record_stages() as timer:
+        if len(steps) == 1:
+            style, intensity = steps[0]
+            image = ImageProcessor.process_image(image, style, intensity, config.TILE_SIZE,
+                                                 render_quality)
+        else:
+            image = ImageProcessor.process_pipeline(image, steps, render_quality)
+    return image, timer.stages
+
+
+def encode_part(image, fmt: str, quality: int = None):
+    """Encode a job's result."""
+    with record_stages() as timer:
+        with stage("encode"):
+            data = encode_image(image, fmt, quality)
+    return data, timer.stages
+
+
+class JobRunner:
+    """
+    Runs queued jobs from a job store on the worker pool.
+
+    Each job is decoded, styled and encoded as three separate pool jobs, so
+    its progress can be reported between them and synchronous requests get
+    a turn in between. At most ``concurrency`` jobs run at once; when the
+    pool is saturated a job waits ``retry_after`` seconds and tries again
+    instead of failing. With a ``budget`` (a ``MemoryBudget``) each job
+    first waits, however long it takes, for room for its estimated peak.
+    """
+
+    def __init__(self, store, pool, budget=None, concurrency: int = 1, retry_after: float = 1.0):
+        self.store = store
+        self.pool = pool
+        self.budget = budget
+        self.concurrency = max(1, concurrency)
+        self.retry_after = retry_after
+        self._task = None
+        self._loop = None
+        self._wakeup = None
+        self._running = set()
+
+    def notify(self):
+        """Start the dispatcher if needed and tell it that a job was queued."""
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._loop is not loop:
+            if self._task is None:
+                # Jobs left running by a previous server process start over
+                self.store.requeue_running()
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._task = loop.create_task(self._dispatch())
+        self._wakeup.set()
+
+    async def stop(self):
+        """Cancel the dispatcher and any running jobs."""
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._running.clear()
+
+    async def _dispatch(self):
+        while True:
+            while len(self._running) < self.concurrency:
+                claimed = self.store.claim()
+                if claimed is None:
+                    break
+                task = asyncio.create_task(self._execute(*claimed))
+                self._running.add(task)
+                task.add_done_callback(self._job_done)
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def _job_done(self, task):
+        self._running.discard(task)
+        self._wakeup.set()
+
+    async def _run_part(self, job_id: str, name: str, progress: float, timings: dict, fn, *args):
+        self.store.update(job_id, stage=name, progress=progress)
+        while True:
+            try:
+                result, stages = await self.pool.run(fn, *args)
+                break
+            except PoolSaturated:
+                await asyncio.sleep(self.retry_after)
+        for stage_name, duration in stages.items():
+            timings[stage_name] = timings.get(stage_name, 0.0) + duration
+        return result
+
+    async def _execute(self, job: dict, contents: bytes):
+        job_id, params = job["id"], job["params"]
+        steps = [tuple(step) for step in params["steps"]]
+        timings = {}
+        reserved = 0
+        try:
+            if self.budget is not None:
+                self.store.update(job_id, stage="admit", progress=0.0)
+                peak = estimate_peak(contents, params["max_size"],
+                                     style_frames(steps, params["render_quality"]))
+                reserved = await self.budget.acquire(peak, patient=True)
+            image = await self._run_part(job_id, "decode", 0.0, timings,
+                                         decode_part, contents, params["max_size"])
+            image = await self._run_part(job_id, "style", 1 / 3, timings,
+                                         style_part, image, steps, params["render_quality"])
+            data = await self._run_part(job_id, "encode", 2 / 3, timings,
+                                        encode_part, image, params["format"], params["quality"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.store.fail(job_id, str(e))
+            return
+        finally:
+            if self.budget is not None:
+                self.budget.release(reserved)
+        observe_stages("job", timings)
+        self.store.finish(job_id, data, OUTPUT_FORMATS[params["format"]],
+                          {name: round(duration, 2) for name, duration in timings.items()})
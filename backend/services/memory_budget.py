@@ -0,0 +1,114 @@
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a request waited too long for room in the memory budget."""
+
+
+class MemoryBudget:
+    """
+    Admission control on the estimated peak memory of running work.
+
+    Each request reserves its estimated working set before it is handed to
+    the worker pool and releases it when it is done. Requests that do not
+    fit wait in arrival order, for at most ``timeout`` seconds, after which
+    they are rejected with ``MemoryBudgetExceeded`` so callers can answer
+    with a 503. A request larger than the whole budget is admitted alone,
+    once nothing else holds a reservation.
+    """
+
+    def __init__(self, max_bytes: int, timeout: float):
+        self.max_bytes = max(1, max_bytes)
+        self.timeout = timeout
+        self.reserved = 0
+        self.rejected = 0
+        self._waiters = deque()  # (bytes, future) in arrival order
+
+    @property
+    def waiting(self) -> int:
+        """Number of requests waiting for room in the budget."""
+        return len(self._waiters)
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.reserved == 0 or self.reserved + nbytes <= self.max_bytes
+
+    def _wake(self):
+        # Admit waiters in order until the first one that does not fit
+        while self._waiters:
+            nbytes, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                break
+            self._waiters.popleft()
+            self.reserved += nbytes
+            future.set_result(None)
+
+    async def acquire(self, nbytes: int, patient: bool = False) -> int:
+        """
+        Reserve ``nbytes`` of the budget, waiting for room if needed.
+
+        Args:
+            nbytes (int): Estimated peak memory of the work
+            patient (bool): Wait as long as it takes instead of ``timeout``,
+                for background work that has no client waiting on it
+
+        Returns:
+            int: The bytes actually reserved, to be passed to ``release``
+
+        Raises:
+            MemoryBudgetExceeded: If there was no room within ``timeout`` seconds
+        """
+        nbytes = min(max(0, nbytes), self.max_bytes)
+        if nbytes == 0:
+            return 0
+        # The counters are only touched from the event loop thread, so no lock is needed
+        if not self._waiters and self._fits(nbytes):
+            self.reserved += nbytes
+            return nbytes
+
+        waiter = (nbytes, asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter[1], None if patient else self.timeout)
+        except BaseException as e:
+            if waiter[1].done() and not waiter[1].cancelled():
+                # Admitted just as the wait ended
+                self.release(nbytes)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                # A large request at the front may have held back smaller ones
+                self._wake()
+            if isinstance(e, asyncio.TimeoutError):
+                self.rejected += 1
+                raise MemoryBudgetExceeded(
+                    f"Memory budget is full ({self.reserved}/{self.max_bytes} bytes reserved)"
+                )
+            raise
+        return nbytes
+
+    def release(self, nbytes: int):
+        """Return a reservation made by ``acquire`` and admit waiting requests."""
+        self.reserved -= nbytes
+        self._wake()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int):
+        """Hold a reservation of ``nbytes`` for the duration of a ``with`` block."""
+        reserved = await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(reserved)
+
+    def stats(self) -> dict:
+        """Return the reserved bytes, the limit and the waiting and rejected counts."""
+        return {
+            "reserved_bytes": self.reserved,
+            "max_bytes": self.max_bytes,
+            "waiting": self.waiting,
+            "rejected": self.rejected,
+        }
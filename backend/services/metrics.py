@@ -0,0 +1,94 @@
+import bisect
+import threading
+
+# Latency buckets in seconds, from fast point styles to slow full-size renders
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(label_value: str) -> str:
+    """Escape a label value as the Prometheus text format requires."""
+    return label_value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """
+    Minimal Prometheus-style histogram with a single label.
+
+    Observing is a bisect plus two additions under a lock, so it is cheap
+    enough to leave on for every request.
+    """
+
+    def __init__(self, name: str, documentation: str, label: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        self._series = {}  # label value -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value: str, seconds: float):
+        """Record one observation for ``label_value``."""
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    def render(self) -> list:
+        """Return the histogram in Prometheus text exposition format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series_items = sorted((key, list(values)) for key, values in self._series.items())
+        for label_value, values in series_items:
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_count{{{label}}} {values[-2]}")
+            lines.append(f"{self.name}_sum{{{label}}} {values[-1]:.6f}")
+        return lines
+
+
+STYLE_LATENCY = Histogram(
+    "zainvision_style_duration_seconds",
+    "Time spent applying a style (or a whole pipeline) to an image.",
+    "style"
+)
+STAGE_LATENCY = Histogram(
+    "zainvision_stage_duration_seconds",
+    "Time spent in each request processing stage.",
+    "stage"
+)
+
+
+def observe_stages(style: str, stages: dict):
+    """Feed the stage timings (in milliseconds) of one request into the histograms."""
+    for name, elapsed_ms in stages.items():
+        STAGE_LATENCY.observe(name, elapsed_ms / 1000)
+    if "style" in stages:
+        STYLE_LATENCY.observe(style, stages["style"] / 1000)
+
+
+def server_timing(stages: dict) -> str:
+    """Format stage timings (in milliseconds) as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={elapsed_ms:.2f}" for name, elapsed_ms in stages.items())
+
+
+def render_metrics(samples: dict) -> str:
+    """
+    Render all histograms plus point-in-time ``samples`` in Prometheus text format.
+
+    Args:
+        samples (dict): Metric name -> (type, help text, value), where type is
+            "counter" or "gauge"
+    """
+    lines = STYLE_LATENCY.render() + STAGE_LATENCY.render()
+    for name, (metric_type, documentation, value) in samples.items():
+        lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}", f"{name} {value}"]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,300 @@
+import io
+
+from PIL import Image
+
+import config
+from processors.filters import get_style
+from processors.image_processor import ImageProcessor
+from processors.render_cache import RenderCache
+from processors.timing import record_stages, stage
+
+# Functions in this module run on the worker pool, so they must stay
+# picklable module-level functions for the process pool mode.
+
+# Full-strength style renderings are cached per process, sized from the configuration
+ImageProcessor.render_cache = RenderCache(max_bytes=config.RENDER_CACHE_MAX_BYTES)
+
+# Supported output formats and their media types
+OUTPUT_FORMATS = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+# Image-sized arrays a render holds besides the style's own temporaries: the
+# result, PIL's padded copy of it and the encoder's output
+_BASE_FRAMES = 2.5
+
+
+def _fit_size(size: tuple, max_size: int) -> tuple:
+    """Return ``size`` scaled down so its longest side is at most ``max_size``."""
+    ratio = max_size / max(size)
+    return tuple(max(1, int(dim * ratio)) for dim in size)
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an upload's header declares more than ``MAX_INPUT_PIXELS`` pixels."""
+
+
+def open_image(contents) -> Image.Image:
+    """
+    Open an upload lazily, reading only its header.
+
+    ``contents`` is either the raw bytes or a binary file holding them, such
+    as the temporary file a large upload was spooled to; a file is read in
+    place rather than copied into memory.
+    """
+    if not hasattr(contents, "read"):
+        # Shares the bytes rather than copying them
+        contents = io.BytesIO(contents)
+    return Image.open(contents)
+
+
+def check_upload(contents, max_pixels: int = config.MAX_INPUT_PIXELS):
+    """
+    Reject an upload whose header declares more than ``max_pixels`` pixels.
+
+    Only the header is read, so an oversized image is turned away before
+    any of it is decoded.
+
+    Raises:
+        ImageTooLarge: If the image has too many pixels
+    """
+    try:
+        width, height = open_image(contents).size
+    except Image.DecompressionBombError as e:
+        raise ImageTooLarge(str(e))
+    except Exception:
+        # Not a readable image; decoding reports the error
+        return
+    if width * height > max_pixels:
+        raise ImageTooLarge(f"Image is {width}x{height}, more than {max_pixels} pixels")
+
+
+def load_image(contents, max_size: int = config.MAX_IMAGE_SIZE) -> Image.Image:
+    """
+    Decode an uploaded image and shrink it to fit within ``max_size``.
+
+    JPEGs are decoded with DCT scaling (``Image.draft``) at the smallest
+    1/2, 1/4 or 1/8 scale that still covers the target size, so a large
+    photo is never fully decoded just to be thrown away. Large remaining
+    downscales reduce by whole factors first and use a cheaper filter.
+
+    Args:
+        contents (bytes or file): Raw bytes of the uploaded file, or a binary
+            file holding them, see ``open_image``
+        max_size (int): Maximum width or height of the decoded image
+
+    Returns:
+        PIL.Image: The decoded image
+    """
+    with stage("open"):
+        image = open_image(contents)
+
+    target_size = None
+    if max(image.size) > max_size:
+        target_size = _fit_size(image.size, max_size)
+        # Only affects JPEGs; other formats ignore the draft request
+        image.draft(None, target_size)
+
+    # Decode now so worker threads can share the image
+    with stage("decode"):
+        image.load()
+
+    if target_size is not None:
+        with stage("resize"):
+            factor = max(image.size) / max_size
+            if factor >= config.FAST_RESAMPLE_FACTOR:
+                image = image.resize(target_size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+            elif factor > 1:
+                image = image.resize(target_size, Image.Resampling.LANCZOS)
+
+    return image
+
+
+def make_proxy(image: Image.Image, size: int) -> Image.Image:
+    """Return a quick downscale of ``image`` whose longest side is at most ``size``."""
+    if max(image.size) <= size:
+        return image
+    return image.resize(_fit_size(image.size, size), Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+
+def load_session(contents, max_size: int = config.MAX_IMAGE_SIZE,
+                 preview_size: int = config.PREVIEW_SIZE):
+    """
+    Decode an upload for a preview session.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        max_size (int): Maximum width or height of the full-quality image
+        preview_size (int): Maximum width or height of the preview proxy
+
+    Returns:
+        tuple: (full-size image, preview proxy) and a dict of stage timings
+        in milliseconds
+    """
+    with record_stages() as timer:
+        image = load_image(contents, max_size)
+        with stage("proxy"):
+            proxy = make_proxy(image, preview_size)
+    return (image, proxy), timer.stages
+
+
+def image_nbytes(image: Image.Image) -> int:
+    """Approximate memory held by a decoded image."""
+    return image.width * image.height * len(image.getbands())
+
+
+def frame_nbytes(image: Image.Image, size: tuple = None) -> int:
+    """Bytes of the RGB(A) array ``image`` is processed as, at ``size`` if given."""
+    width, height = size or image.size
+    has_alpha = "A" in image.mode or "transparency" in image.info
+    return width * height * (4 if has_alpha else 3)
+
+
+def style_frames(steps, render_quality: str = "best", outputs: int = 1) -> float:
+    """
+    Estimate the peak memory of styling and encoding, in image-sized arrays.
+
+    Args:
+        steps (sequence): (style, intensity) pairs applied to the image
+        render_quality (str): Speed/quality tier of the expensive styles
+        outputs (int): Results produced from the image, e.g. sweep cells
+
+    Returns:
+        float: Peak size as a multiple of ``frame_nbytes``
+    """
+    styles = [get_style(style, render_quality) for style, _ in steps]
+    return _BASE_FRAMES * outputs + max(
+        (style.working_set for style in styles if style is not None), default=0.0
+    )
+
+
+def estimate_peak(contents, max_size: int, frames: float) -> int:
+    """
+    Estimate the peak memory of decoding an upload and processing it.
+
+    Only the header is read: the decoded size follows from the dimensions,
+    the mode and the JPEG draft scale ``load_image`` will use.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        max_size (int): Maximum width or height of the processed image
+        frames (float): Image-sized arrays processing needs, see ``style_frames``
+
+    Returns:
+        int: Estimated bytes, or 0 if the upload is not a readable image
+    """
+    try:
+        image = open_image(contents)
+    except Exception:
+        # Decoding fails straight away, so there is nothing to reserve
+        return 0
+    size = image.size
+    if max(size) > max_size:
+        size = _fit_size(size, max_size)
+        image.draft(None, size)
+    return int(image_nbytes(image) + frame_nbytes(image, size) * frames)
+
+
+def encode_image(image: Image.Image, fmt: str = "png", quality: int = None) -> bytes:
+    """
+    Encode a PIL image in the requested output format.
+
+    Args:
+        image (PIL.Image): Image to encode
+        fmt (str): One of ``OUTPUT_FORMATS``
+        quality (int): zlib compress level (0-9) for PNG, quality (1-100) for JPEG
+            and WebP; the configured default if None
+
+    Returns:
+        bytes: The encoded image
+    """
+    img_byte_arr = io.BytesIO()
+    if fmt == "jpeg":
+        # JPEG has no alpha channel
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        image.save(img_byte_arr, format="JPEG",
+                   quality=quality or config.JPEG_QUALITY)
+    elif fmt == "webp":
+        image.save(img_byte_arr, format="WEBP",
+                   quality=quality or config.WEBP_QUALITY, method=config.WEBP_METHOD)
+    else:
+        image.save(img_byte_arr, format="PNG",
+                   compress_level=config.PNG_COMPRESS_LEVEL if quality is None else quality)
+    return img_byte_arr.getvalue()
+
+
+def render_decoded(image: Image.Image, style: str, intensity: float,
+                   fmt: str = "png", quality: int = None, render_quality: str = "best"):
+    """
+    Style an already decoded image and encode it.
+
+    Produces the same bytes as ``render_image`` for the same upload, so both
+    can share result cache entries.
+
+    Returns:
+        tuple: Encoded bytes and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        processed_image = ImageProcessor.process_image(
+            image, style, intensity, config.TILE_SIZE, render_quality, scratch=True
+        )
+        with stage("encode"):
+            data = encode_image(processed_image, fmt, quality)
+    return data, timer.stages
+
+
+def render_image(contents, style: str, intensity: float,
+                 max_size: int = config.MAX_IMAGE_SIZE, fmt: str = "png", quality: int = None,
+                 render_quality: str = "best"):
+    """
+    Decode, resize, style and encode an uploaded image.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        style (str): Style to apply to the image
+        intensity (float): Intensity of the effect (0.0 to 1.0)
+        max_size (int): Maximum width or height of the processed image
+        fmt (str): Output format, one of ``OUTPUT_FORMATS``
+        quality (int): Encoder setting, see ``encode_image``
+        render_quality (str): Speed/quality tier of the expensive styles, see
+            ``ImageProcessor.process_array``
+
+    Returns:
+        tuple: Encoded bytes and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        image = load_image(contents, max_size)
+        processed_image = ImageProcessor.process_image(
+            image, style, intensity, config.TILE_SIZE, render_quality, scratch=True
+        )
+        with stage("encode"):
+            data = encode_image(processed_image, fmt, quality)
+    return data, timer.stages
+
+
+def render_pipeline(contents, steps: tuple, max_size: int = config.MAX_IMAGE_SIZE,
+                    fmt: str = "png", quality: int = None, render_quality: str = "best"):
+    """
+    Decode an uploaded image once, apply several styles in order and encode once.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        steps (tuple): Ordered (style, intensity) pairs
+        max_size (int): Maximum width or height of the processed image
+        fmt (str): Output format, one of ``OUTPUT_FORMATS``
+        quality (int): Encoder setting, see ``encode_image``
+        render_quality (str): Speed/quality tier of the expensive styles, see
+            ``ImageProcessor.process_array``
+
+    Returns:
+        tuple: Encoded bytes and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        image = load_image(contents, max_size)
+        processed_image = ImageProcessor.process_pipeline(image, steps, render_quality)
+        with stage("encode"):
+            data = encode_image(processed_image, fmt, quality)
+    return data, timer.stages
@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Bytes read at a time when hashing an upload kept in a file
+_HASH_CHUNK = 1024 * 1024
+
+
+class ResultCache:
+    """
+    Content-addressed cache for encoded processing results.
+
+    Entries are keyed on the hash of the uploaded bytes together with the
+    processing parameters, held in memory in LRU order up to ``max_bytes``
+    and optionally mirrored to ``disk_dir`` (bounded by ``disk_max_bytes``)
+    so results survive restarts.
+    """
+
+    def __init__(self, max_bytes: int, disk_dir: str = None, disk_max_bytes: int = 0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(contents, *params) -> str:
+        """
+        Build a cache key from the uploaded bytes and processing parameters.
+
+        Args:
+            contents (bytes or file): Raw bytes of the uploaded file, or a
+                binary file holding them, which is hashed in chunks
+            *params: Processing parameters (style, quantized intensity, format, ...)
+
+        Returns:
+            str: Hex digest identifying the result
+        """
+        if hasattr(contents, "read"):
+            hasher = hashlib.sha256()
+            contents.seek(0)
+            for chunk in iter(lambda: contents.read(_HASH_CHUNK), b""):
+                hasher.update(chunk)
+            digest = hasher.hexdigest()
+        else:
+            digest = hashlib.sha256(contents).hexdigest()
+        key_source = "|".join([digest] + [str(param) for param in params])
+        return hashlib.sha256(key_source.encode()).hexdigest()
+
+    def get(self, key: str):
+        """Return the cached bytes for ``key`` or None on a miss."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, data)
+        return data
+
+    def put(self, key: str, data: bytes):
+        """Store ``data`` under ``key`` in memory and, if enabled, on disk."""
+        with self._lock:
+            self._store(key, data)
+        self._write_disk(key, data)
+
+    def _store(self, key, data):
+        # Entries larger than the whole budget would evict everything else
+        if len(data) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= len(previous)
+        self._entries[key] = data
+        self._size += len(data)
+        while self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _read_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Refresh mtime so disk eviction is LRU as well
+            return data
+        except OSError:
+            return None
+
+    def _write_disk(self, key, data):
+        if not self.disk_dir or len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = []
+        total = 0
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".bin"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and current usage for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_ratio": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "disk_enabled": bool(self.disk_dir),
+            }
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Check an If-None-Match header value against a strong ETag."""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or any(
+        tag.removeprefix("W/") == etag for tag in candidates
+    )
@@ -0,0 +1,114 @@
+from collections import OrderedDict
+
+from PIL import Image
+
+import config
+from processors.filters import BlendFilter, get_style
+from processors.image_processor import ImageProcessor
+from processors.timing import record_stages, stage
+from services.rendering import encode_image, load_image
+
+# Functions in this module run on the worker pool, so they must stay
+# picklable module-level functions for the process pool mode.
+
+
+def decode_source(contents: bytes, max_size: int = config.MAX_IMAGE_SIZE):
+    """
+    Decode an upload into the RGB(A) array a scrub session works on.
+
+    Returns:
+        tuple: The decoded array and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        image = load_image(contents, max_size)
+        with stage("to_cv2"):
+            array = ImageProcessor.to_array(image)
+    return array, timer.stages
+
+
+def has_render_step(style: str) -> bool:
+    """True if ``style`` has an intensity-independent rendering worth caching."""
+    return isinstance(get_style(style), BlendFilter)
+
+
+def render_source(array, style: str, render_quality: str = "best"):
+    """
+    Compute the intensity-independent rendering of ``style`` for a session.
+
+    ``render_quality`` is the speed/quality tier, see ``ImageProcessor.process_array``.
+
+    Returns:
+        tuple: The rendering (None if the style has no separate render step)
+        and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        with stage("render"):
+            rendered = ImageProcessor.render_style(
+                array, style, channel_order="RGB", quality=render_quality
+            )
+    if rendered is not None:
+        # Shared by every later frame of the session
+        rendered.setflags(write=False)
+    return rendered, timer.stages
+
+
+def render_frame(array, rendered, style: str, intensity: float, fmt: str, quality: int = None,
+                 render_quality: str = "best"):
+    """
+    Produce one encoded frame, blending a cached rendering when there is one.
+
+    Styles without a separate render step are cheap point-wise or
+    kernel-size-dependent filters and simply run in full.
+
+    Returns:
+        tuple: Encoded bytes and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        if rendered is not None:
+            with stage("blend"):
+                processed = ImageProcessor.blend_rendered(array, rendered, intensity)
+        else:
+            with stage("style"):
+                processed = ImageProcessor.process_array(
+                    array, style, intensity, channel_order="RGB", tile_size=config.TILE_SIZE,
+                    quality=render_quality
+                )
+        with stage("to_pil"):
+            image = Image.fromarray(processed)
+        with stage("encode"):
+            data = encode_image(image, fmt, quality)
+    return data, timer.stages
+
+
+class ScrubSession:
+    """
+    State of one scrubbing connection: the decoded source image and the
+    most recently used full-strength renderings, one per (style, render
+    quality) key.
+    """
+
+    def __init__(self, max_renders: int = config.SCRUB_MAX_RENDERS):
+        self.max_renders = max_renders
+        self.source = None
+        self._renders = OrderedDict()
+
+    def set_source(self, array):
+        """Replace the source image, dropping renderings made from the old one."""
+        self.source = array
+        self._renders.clear()
+
+    def has_render(self, key: tuple) -> bool:
+        """True if the rendering for ``key`` (possibly None) is cached."""
+        return key in self._renders
+
+    def get_render(self, key: tuple):
+        """Return the cached rendering for ``key``; see ``has_render``."""
+        self._renders.move_to_end(key)
+        return self._renders[key]
+
+    def put_render(self, key: tuple, rendered):
+        """Cache the rendering for ``key``, evicting the least recently used."""
+        self._renders[key] = rendered
+        self._renders.move_to_end(key)
+        while len(self._renders) > self.max_renders:
+            self._renders.popitem(last=False)
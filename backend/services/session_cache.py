@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class SessionCache:
+    """
+    Short-lived store of decoded uploads for follow-up renders.
+
+    A preview request decodes the upload once and keeps the result here, so
+    the full-quality render (and further previews) can reference it by
+    session id instead of uploading and decoding the image again. Entries
+    expire ``ttl`` seconds after their last use, and the least recently
+    used are evicted once their total size exceeds ``max_bytes``.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float, clock=time.monotonic):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (value, size, expires_at)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Return the value stored under ``key`` and extend its lifetime, or None."""
+        with self._lock:
+            self._expire()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, _ = entry
+            self._entries[key] = (value, size, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: str, value, size: int):
+        """
+        Store ``value`` under ``key``.
+
+        Args:
+            key (str): Session id
+            value: Decoded session data
+            size (int): Approximate memory held by ``value`` in bytes
+        """
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous[1]
+            # Entries larger than the whole budget would evict everything else
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, self._clock() + self.ttl)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._size -= evicted_size
+
+    def _expire(self):
+        # Entries are kept in last-use order, so expired ones are at the front
+        now = self._clock()
+        while self._entries:
+            key, (_, size, expires_at) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self._size -= size
+
+    def stats(self) -> dict:
+        """Return session counts and memory usage."""
+        with self._lock:
+            self._expire()
+            return {
+                "sessions": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,41 @@
+import config
+
+
+def quantize_intensity(intensity: float) -> float:
+    """Snap intensity to the cache step so near-identical requests share results."""
+    steps = round(intensity / config.INTENSITY_STEP)
+    return round(steps * config.INTENSITY_STEP, 4)
+
+
+def parse_steps(steps: str, max_steps: int = None) -> tuple:
+    """
+    Parse a pipeline description such as ``"sepia:0.8,vintage,blur:0.3"``.
+
+    A step without an intensity runs at 1.0. Intensities are quantized with
+    ``quantize_intensity``, so the API and the bulk tool render the same
+    steps for the same description.
+
+    Args:
+        steps (str): Comma-separated style:intensity steps
+        max_steps (int): Most steps allowed, or None for no limit
+
+    Returns:
+        tuple: Ordered (style, intensity) pairs
+
+    Raises:
+        ValueError: If the description is malformed or has too many steps
+    """
+    parsed = []
+    for item in steps.split(","):
+        style, _, intensity = item.strip().partition(":")
+        try:
+            value = float(intensity) if intensity else 1.0
+        except ValueError:
+            raise ValueError(f"Invalid intensity in step '{item}'")
+        if not style or not 0.0 <= value <= 1.0:
+            raise ValueError(f"Invalid pipeline step '{item}'")
+        parsed.append((style, quantize_intensity(value)))
+
+    if max_steps is not None and len(parsed) > max_steps:
+        raise ValueError(f"Pipelines are limited to {max_steps} steps")
+    return tuple(parsed)
@@ -0,0 +1,142 @@
+import cv2
+import numpy as np
+from PIL import Image
+
+import config
+from processors.image_processor import ImageProcessor
+from processors.timing import record_stages, stage
+from services.rendering import OUTPUT_FORMATS, encode_image, load_image
+
+# Functions in this module run on the worker pool, so they must stay
+# picklable module-level functions for the process pool mode.
+
+# Contact sheet layout: white gutters between cells and a caption strip under each
+_GAP = 8
+_LABEL_HEIGHT = 18
+_BACKGROUND = 255
+_INK = 32
+
+
+def _decode(contents, max_size: int) -> np.ndarray:
+    """Decode an upload once into the RGB(A) array every cell is made from."""
+    image = load_image(contents, max_size)
+    with stage("to_cv2"):
+        return ImageProcessor.to_array(image)
+
+
+def _sweep(array: np.ndarray, style: str, intensities: tuple, render_quality: str,
+           out=None) -> list:
+    """Render one style at every intensity of the sweep."""
+    with stage("style"):
+        return ImageProcessor.sweep_array(
+            array, style, intensities, channel_order="RGB", out=out, tile_size=config.TILE_SIZE,
+            quality=render_quality
+        )
+
+
+def render_sheet(contents, styles: tuple, intensities: tuple,
+                 max_size: int = config.SWEEP_CELL_SIZE, labels: bool = True,
+                 fmt: str = "png", quality: int = None, render_quality: str = "best"):
+    """
+    Decode an upload once and compose a contact sheet of styles by intensities.
+
+    Each row is one style and each column one intensity. Cells are written
+    straight into the sheet, which is encoded once.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        styles (tuple): Styles to sweep, one row each
+        intensities (tuple): Intensities to sweep, one column each
+        max_size (int): Longest side of each cell
+        labels (bool): Caption every cell with its style and intensity
+        fmt (str): Output format, one of ``OUTPUT_FORMATS``
+        quality (int): Encoder setting, see ``encode_image``
+        render_quality (str): Speed/quality tier of the expensive styles, see
+            ``ImageProcessor.process_array``
+
+    Returns:
+        tuple: Encoded bytes and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        array = _decode(contents, max_size)
+        rows, cols = array.shape[:2]
+        # process_array returns RGB, or RGBA when the source has alpha
+        channels = 4 if array.ndim == 3 and array.shape[2] in (2, 4) else 3
+        label_height = _LABEL_HEIGHT if labels else 0
+        cell_width = cols + _GAP
+        cell_height = rows + label_height + _GAP
+
+        with stage("compose"):
+            sheet = np.full(
+                (_GAP + cell_height * len(styles), _GAP + cell_width * len(intensities), channels),
+                _BACKGROUND, dtype=np.uint8
+            )
+
+        for row, style in enumerate(styles):
+            top = _GAP + row * cell_height
+            cells = [
+                sheet[top:top + rows, left:left + cols]
+                for left in range(_GAP, _GAP + cell_width * len(intensities), cell_width)
+            ]
+            _sweep(array, style, intensities, render_quality, out=cells)
+
+        if labels:
+            with stage("compose"):
+                ink = (_INK,) * 3 + (255,) * (channels - 3)
+                for row, style in enumerate(styles):
+                    baseline = _GAP + row * cell_height + rows + label_height - 5
+                    for column, intensity in enumerate(intensities):
+                        cv2.putText(sheet, f"{style} {intensity:g}",
+                                    (_GAP + column * cell_width, baseline),
+                                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, ink, 1, cv2.LINE_AA)
+
+        with stage("to_pil"):
+            image = Image.fromarray(sheet)
+        with stage("encode"):
+            data = encode_image(image, fmt, quality)
+    return data, timer.stages
+
+
+def render_sweep_parts(contents, styles: tuple, intensities: tuple, boundary: str,
+                       max_size: int = config.SWEEP_CELL_SIZE, fmt: str = "png",
+                       quality: int = None, render_quality: str = "best"):
+    """
+    Decode an upload once and return every (style, intensity) cell as a multipart body.
+
+    Each part carries its own Content-Type, a ``<style>_<intensity>.<ext>``
+    filename and ``X-Style`` / ``X-Intensity`` headers.
+
+    Args:
+        contents (bytes or file): The upload, see ``open_image``
+        styles (tuple): Styles to sweep
+        intensities (tuple): Intensities to sweep
+        boundary (str): Multipart boundary, also sent in the response Content-Type
+        max_size (int): Longest side of each image
+        fmt (str): Output format, one of ``OUTPUT_FORMATS``
+        quality (int): Encoder setting, see ``encode_image``
+        render_quality (str): Speed/quality tier of the expensive styles, see
+            ``ImageProcessor.process_array``
+
+    Returns:
+        tuple: The multipart body and a dict of stage timings in milliseconds
+    """
+    with record_stages() as timer:
+        array = _decode(contents, max_size)
+        chunks = []
+        for style in styles:
+            for intensity, processed in zip(intensities, _sweep(array, style, intensities, render_quality)):
+                with stage("to_pil"):
+                    image = Image.fromarray(processed)
+                with stage("encode"):
+                    data = encode_image(image, fmt, quality)
+                headers = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {OUTPUT_FORMATS[fmt]}\r\n"
+                    f'Content-Disposition: inline; filename="{style}_{intensity:g}.{fmt}"\r\n'
+                    f"X-Style: {style}\r\n"
+                    f"X-Intensity: {intensity:g}\r\n"
+                    "\r\n"
+                )
+                chunks += [headers.encode(), data, b"\r\n"]
+        chunks.append(f"--{boundary}--\r\n".encode())
+    return b"".join(chunks), timer.stages
@@ -0,0 +1,48 @@
+import io
+import time
+
+import numpy as np
+from PIL import Image
+
+from processors.filters import QUALITIES
+from processors.image_processor import ImageProcessor
+from services.rendering import OUTPUT_FORMATS, encode_image, load_image
+
+# Longest side of the warm-up image; large enough for every style's kernels
+WARMUP_SIZE = 32
+
+
+def warm_up(size: int = WARMUP_SIZE) -> dict:
+    """
+    Run every style at every quality tier, and every codec, once on a tiny image.
+
+    OpenCV builds some tables on first use (the Lab conversion behind
+    hdr_effect takes about 200 ms) and PIL loads its codecs on first use, so
+    running this at startup keeps those costs off the first real request.
+    It runs on the worker pool, so it must stay a picklable module-level
+    function for the process pool mode.
+
+    Args:
+        size (int): Width and height of the image styled
+
+    Returns:
+        dict: Milliseconds spent per style, plus ``codecs`` for decoding and encoding
+    """
+    # Noise rather than a flat colour, so no style takes a shortcut
+    array = np.random.default_rng(0).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    timings = {}
+    for style in ImageProcessor.get_available_styles():
+        start = time.perf_counter()
+        for quality in QUALITIES:
+            ImageProcessor.process_array(array, style, 0.5, "RGB", quality=quality, cache=False)
+        timings[style] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    image = Image.fromarray(array)
+    for fmt in OUTPUT_FORMATS:
+        buffer = io.BytesIO()
+        image.save(buffer, format=fmt.upper())
+        load_image(buffer.getvalue(), size)
+        encode_image(image, fmt)
+    timings["codecs"] = (time.perf_counter() - start) * 1000
+    return timings
@@ -0,0 +1,132 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+
+class PoolSaturated(Exception):
+    """Raised when the worker pool queue is full and a job cannot be accepted."""
+
+
+class WorkerPool:
+    """
+    Bounded executor for running CPU-bound work off the event loop.
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue`` more
+    wait for a free worker. Anything beyond that is rejected straight away
+    with ``PoolSaturated`` so callers can answer with a 503 instead of
+    letting latency grow without bound.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, kind: str = "thread"):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker kind: {kind}")
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.kind = kind
+        self._executor = None
+        self._pending = 0
+        self._batches = set()
+
+    @property
+    def pending(self) -> int:
+        """Number of jobs currently running or waiting for a worker."""
+        return self._pending
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of jobs accepted at the same time."""
+        return self.max_workers + self.max_queue
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="zainvision-worker"
+                )
+        return self._executor
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        Raises:
+            PoolSaturated: If the pool already holds ``capacity`` jobs
+        """
+        if self._pending >= self.capacity:
+            raise PoolSaturated(
+                f"Worker queue is full ({self._pending}/{self.capacity} jobs)"
+            )
+
+        # The counter is only touched from the event loop thread, so no lock is needed
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), partial(fn, *args, **kwargs)
+            )
+        finally:
+            self._pending -= 1
+
+    def submit_batch(self, fn, arg_list):
+        """
+        Schedule ``fn(*args)`` for every tuple in ``arg_list``, as one admitted batch.
+
+        The batch holds one slot per call it runs at once, up to
+        ``max_workers``, and feeds its next call to the pool only when one of
+        its own finishes. Its remaining calls wait in the batch rather than
+        in the executor's queue, so the number of jobs on the pool never
+        exceeds ``capacity``. A call whose future was cancelled is skipped.
+
+        Returns:
+            list: asyncio futures in the same order as ``arg_list``
+
+        Raises:
+            PoolSaturated: If the pool cannot take the batch's slots
+        """
+        if not arg_list:
+            return []
+        slots = min(len(arg_list), self.max_workers)
+        if self._pending + slots > self.capacity:
+            raise PoolSaturated(
+                f"Worker queue is full ({self._pending}/{self.capacity} jobs, "
+                f"a batch needs {slots})"
+            )
+
+        self._pending += slots
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        futures = [loop.create_future() for _ in arg_list]
+        calls = iter(zip(futures, arg_list))
+
+        async def drain():
+            # Each drain runs one call at a time, so the batch uses ``slots`` workers
+            for future, args in calls:
+                if future.cancelled():
+                    continue
+                try:
+                    result = await loop.run_in_executor(executor, partial(fn, *args))
+                except Exception as e:
+                    if not future.done():
+                        future.set_exception(e)
+                else:
+                    if not future.done():
+                        future.set_result(result)
+
+        def release(batch):
+            self._pending -= slots
+            self._batches.discard(batch)
+
+        batch = asyncio.gather(*(drain() for _ in range(slots)))
+        # The event loop only keeps weak references to running tasks
+        self._batches.add(batch)
+        batch.add_done_callback(release)
+        return futures
+
+    def shutdown(self):
+        """Stop the executor, waiting for running jobs to finish."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
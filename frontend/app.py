@@ -1,6 +1,7 @@
 import streamlit as st
 import httpx
 from PIL import Image
+import hashlib
 import io
 import time
 
@@ -104,6 +105,12 @@ st.markdown("""
 # Constants
 API_URL = st.secrets.get("API_URL", "https://zain-vision-pro.vercel.app")  # Vercel deployment URL
 
+# Seconds the /styles and / responses are reused before they are fetched again
+API_INFO_TTL = 300
+
+# Processed results kept per browser session, so revisiting a setting needs no request
+MAX_CACHED_RESULTS = 16
+
 # Add a debug message to verify the API URL
 if st.secrets.get("DEBUG", False):
     st.sidebar.info(f"API URL: {API_URL}")
@@ -115,31 +122,154 @@ if 'total_processed' not in st.session_state:
     st.session_state.total_processed = 0
 if 'processing_times' not in st.session_state:
     st.session_state.processing_times = []
+if 'preview_session' not in st.session_state:
+    st.session_state.preview_session = None  # (upload digest, server session id)
+if 'upload' not in st.session_state:
+    st.session_state.upload = None  # The selected file, as prepared by prepare_upload
+if 'results' not in st.session_state:
+    st.session_state.results = {}  # (upload digest, style, intensity) -> PNG bytes, oldest first
+
+@st.cache_resource
+def get_client():
+    """Return the HTTP client shared by every session, keeping connections to the API alive."""
+    return httpx.Client(
+        base_url=API_URL,
+        timeout=httpx.Timeout(60.0, connect=10.0),
+        limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+    )
+
+@st.cache_data(ttl=API_INFO_TTL, show_spinner=False)
+def fetch_api_info():
+    """Fetch the available styles and the API information, reused for ``API_INFO_TTL`` seconds."""
+    client = get_client()
+    styles_response = client.get("/styles")
+    styles_response.raise_for_status()
+    info_response = client.get("/")
+    info_response.raise_for_status()
+    return styles_response.json(), info_response.json()
 
 def get_api_info():
     """Fetch API information including available styles."""
     try:
-        with httpx.Client() as client:
-            styles_response = client.get(f"{API_URL}/styles")
-            info_response = client.get(f"{API_URL}/")
-            return styles_response.json(), info_response.json()
+        # Failures are not cached, so the next rerun tries again
+        return fetch_api_info()
     except Exception as e:
         st.error(f"Failed to fetch API information: {str(e)}")
         return None, None
 
-def process_image(image_file, style, intensity):
-    """Send image to backend for processing and return processed image."""
+def prepare_upload(uploaded_file, max_size):
+    """
+    Return what to send to the API for ``uploaded_file``.
+
+    Images larger than the backend's ``max_size`` are shrunk here to the
+    size the backend would shrink them to, and re-encoded (JPEG at quality
+    95, PNG if there is transparency), so the full-resolution original is
+    never uploaded. The result is kept for as long as the file stays selected.
+
+    Returns:
+        dict: ``name``, upload ``data``, its SHA-256 ``digest`` and its ``size``
+    """
+    upload = st.session_state.upload
+    if upload and upload["file_id"] == uploaded_file.file_id:
+        return upload
+
+    data = uploaded_file.getvalue()
+    image = Image.open(io.BytesIO(data))
+    size = image.size
+    if max_size and max(size) > max_size:
+        ratio = max_size / max(size)
+        size = tuple(max(1, int(dim * ratio)) for dim in size)
+        # Decode JPEGs at a reduced scale rather than at full resolution
+        image.draft(None, size)
+        if image.mode not in ("RGB", "RGBA", "L", "LA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+        image = image.resize(size, Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        if image.mode in ("RGB", "L"):
+            image.save(buf, format="JPEG", quality=95)
+        else:
+            image.save(buf, format="PNG")
+        data = buf.getvalue()
+
+    upload = {
+        "file_id": uploaded_file.file_id,
+        "name": uploaded_file.name,
+        "data": data,
+        "digest": hashlib.sha256(data).hexdigest(),
+        "size": size,
+    }
+    st.session_state.upload = upload
+    return upload
+
+def _result_key(upload, style, intensity):
+    return upload["digest"], style, round(intensity, 2)
+
+def cached_result(upload, style, intensity):
+    """Return the PNG bytes of a result rendered earlier in this session, or None."""
+    results = st.session_state.results
+    key = _result_key(upload, style, intensity)
+    if key not in results:
+        return None
+    # Move to the end, so the least recently used result is evicted first
+    results[key] = results.pop(key)
+    return results[key]
+
+def _store_result(upload, style, intensity, data):
+    results = st.session_state.results
+    results[_result_key(upload, style, intensity)] = data
+    while len(results) > MAX_CACHED_RESULTS:
+        del results[next(iter(results))]
+
+def _session_id(upload):
+    """Return the server session holding the decoded upload, if one was opened."""
+    session = st.session_state.preview_session
+    if session and session[0] == upload["digest"]:
+        return session[1]
+    return None
+
+def _render(upload, params):
+    """
+    Render from the image's server session, uploading the image again only
+    if there is no session or it has expired.
+    """
+    client = get_client()
+    session_id = _session_id(upload)
+    if session_id:
+        response = client.get(f"/sessions/{session_id}/image", params=params)
+        if response.status_code != 404:
+            return response
+
+    response = client.post(
+        "/process-image", files={"file": (upload["name"], upload["data"])}, params=params
+    )
+    if "X-Session-Id" in response.headers:
+        st.session_state.preview_session = (upload["digest"], response.headers["X-Session-Id"])
+    return response
+
+def preview_image(upload, style, intensity):
+    """Fetch a fast low-resolution preview, opening a server session for the full render."""
+    try:
+        params = {"style": style, "intensity": intensity, "preview": "true"}
+        response = _render(upload, params)
+        if response.status_code == 200:
+            return Image.open(io.BytesIO(response.content))
+    except Exception:
+        pass
+    # The full render follows anyway, so a failed preview is not worth an error
+    return None
+
+def process_image(upload, style, intensity):
+    """
+    Send the upload to the backend for processing.
+
+    Returns:
+        bytes: The processed image as PNG, or None if processing failed
+    """
     try:
         start_time = time.time()
-        files = {"file": image_file}
         params = {"style": style, "intensity": intensity}
 
-        with httpx.Client() as client:
-            response = client.post(
-                f"{API_URL}/process-image",
-                files=files,
-                params=params
-            )
+        response = _render(upload, params)
 
         processing_time = time.time() - start_time
         st.session_state.processing_times.append(processing_time)
@@ -152,7 +282,8 @@ def process_image(image_file, style, intensity):
                 "intensity": intensity,
                 "time": processing_time
             })
-            return Image.open(io.BytesIO(response.content))
+            _store_result(upload, style, intensity, response.content)
+            return response.content
         else:
             st.error(f"Error processing image: {response.text}")
             return None
@@ -269,6 +400,13 @@ def main():
             help="Adjust the strength of the selected effect"
         )
 
+        # Live preview renders on every change, showing a quick preview first
+        live_preview = st.toggle(
+            "Live Preview",
+            value=True,
+            help="Re-render on every change, showing a low-resolution preview until the full-quality result arrives"
+        )
+
         # Process button
         process_button = st.button("Apply Style", use_container_width=True)
 
@@ -304,41 +442,50 @@ def main():
             st.subheader("Original Image")
             original_image = Image.open(uploaded_file)
             st.image(original_image, use_container_width=True)
+        upload = prepare_upload(uploaded_file, api_info.get("max_image_size"))
 
         # Process and display styled image
         with col2:
             st.subheader("Processed Image")
-            if process_button:
-                with st.spinner("Processing image..."):
-                    # Reset file pointer
-                    uploaded_file.seek(0)
-
-                    # Process image
-                    processed_image = process_image(uploaded_file, selected_style, intensity)
-
-                    if processed_image:
-                        st.image(processed_image, use_container_width=True)
-
-                        # Add download button with custom filename
-                        buf = io.BytesIO()
-                        processed_image.save(buf, format="PNG")
-                        timestamp = time.strftime("%Y%m%d_%H%M%S")
-                        st.download_button(
-                            label="💾 Download Processed Image",
-                            data=buf.getvalue(),
-                            file_name=f"zainvision_{selected_style}_{timestamp}.png",
-                            mime="image/png",
-                            use_container_width=True
-                        )
-
-                        # Display image information
-                        st.markdown("#### Image Information")
-                        st.markdown(f"""
-                        - **Style Applied:** {selected_style.replace('_', ' ').title()}
-                        - **Intensity:** {intensity:.1f}
-                        - **Original Size:** {original_image.size}
-                        - **Processing Time:** {st.session_state.processing_times[-1]:.2f} seconds
-                        """)
+            if process_button or live_preview:
+                result_slot = st.empty()
+                processed = cached_result(upload, selected_style, intensity)
+                processing_time = "cached"
+
+                if processed is None:
+                    # Show the quick preview while the full-quality render is running
+                    preview = preview_image(upload, selected_style, intensity)
+                    if preview:
+                        result_slot.image(preview, caption="Preview", use_container_width=True)
+
+                    with st.spinner("Processing image..."):
+                        # Process image
+                        processed = process_image(upload, selected_style, intensity)
+                        if processed:
+                            processing_time = f"{st.session_state.processing_times[-1]:.2f} seconds"
+
+                if processed:
+                    result_slot.image(processed, use_container_width=True)
+
+                    # The backend's PNG is offered as is, without decoding and re-encoding it
+                    timestamp = time.strftime("%Y%m%d_%H%M%S")
+                    st.download_button(
+                        label="💾 Download Processed Image",
+                        data=processed,
+                        file_name=f"zainvision_{selected_style}_{timestamp}.png",
+                        mime="image/png",
+                        use_container_width=True
+                    )
+
+                    # Display image information
+                    st.markdown("#### Image Information")
+                    st.markdown(f"""
+                    - **Style Applied:** {selected_style.replace('_', ' ').title()}
+                    - **Intensity:** {intensity:.1f}
+                    - **Original Size:** {original_image.size}
+                    - **Processed Size:** {upload['size']}
+                    - **Processing Time:** {processing_time}
+                    """)
     # Display usage tips
     display_usage_tips()
     # Footer